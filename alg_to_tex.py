@@ -3,13 +3,16 @@
 import sys
 from graph import *
 import pert_charts as pert
+from render import RenderPool, RenderCache, command_renderer, command_version, timing_report
 import os
+import glob
+import time
 import argparse
 
 
 parser=argparse.ArgumentParser()
 
-parser.add_argument("dotfile", help="A graph-definition file, in DOT format", type=str)
+parser.add_argument("dotfile", help="A graph-definition file, in DOT format (or a binary snapshot, see Graph.save_binary)", type=str)
 parser.add_argument("prefix", help="A file prefix", type=str)
 parser.add_argument("-l", "--layout", type=int, help="The number of figures to be packed on a same line of the page")
 parser.add_argument("-r", "--linewidth-ratio", type=float, help="The width taken by a single graph, as a ratio of the linewidth")
@@ -18,6 +21,11 @@ parser.add_argument("-s", "--standalone", help="Generate a self-contained LaTeX
 parser.add_argument("-d", "--description-string", type=str, help="The description string to be used in the key box. Ex.  'CLRS3, Exercise 6.1-3'")
 parser.add_argument("-a", "--algorithm", type=str, help="Algorithm: 'dfs' or 'bfs'.")
 parser.add_argument("-v", "--vertex", type=str, help="Start vertex")
+parser.add_argument("-j", "--jobs", type=int, help="The number of diagrams rendered at the same time (default: the number of processors)")
+parser.add_argument("--renderer", type=str, default='dot', help="The Graphviz command used to render the diagrams (default: dot)")
+parser.add_argument("-t", "--timing", help="Report the rendering time of each diagram (and the cache statistics) on the standard error", action="store_true" )
+parser.add_argument("-c", "--cache", type=str, help="A directory where rendered diagrams are cached: diagrams whose DOT text has already been rendered (by the same renderer version) are not rendered again")
+parser.add_argument("--cache-size", type=int, default=256, help="The maximum size of the cache, in MB (default: 256); the least recently used diagrams are removed first")
 
 args = parser.parse_args()
 
@@ -27,9 +35,19 @@ if args.layout is not None:
 	layout = args.layout
 	
 
-g = Graph.from_dot( args.dotfile)
+def load_graph( path, graph_class=Graph ):
+	""" Load a DOT file, or a binary snapshot (then the adjacency lists are in label order) """
+	with open( path, 'rb' ) as f:
+		binary = f.read( len(FrozenGraph.BINARY_MAGIC) ) == FrozenGraph.BINARY_MAGIC
+	if binary:
+		return FrozenGraph.load_binary( path ).thaw( graph_class )
+	return graph_class.from_dot( path )
 
-os.system('rm -f {}[0-9]*'.format(args.prefix))
+g = load_graph( args.dotfile )
+
+# diagrams from a previous run
+for path in glob.glob( glob.escape( args.prefix ) + '[0-9]*' ):
+	os.remove( path )
 
 if args.algorithm=='dfs':
 	g.depth_first( args.prefix, blank=args.blank )
@@ -40,21 +58,33 @@ elif args.algorithm=='topo':
 elif args.algorithm=='dijkstra':
 	g.dijkstra( args.vertex, args.prefix, blank=args.blank )
 	algorithm_str = "Dijkstra Shortest Path"
+elif args.algorithm=='bellman-ford':
+	g.bellman_ford( args.vertex, args.prefix, blank=args.blank )
+	algorithm_str = "Bellman-Ford Shortest Path"
 elif args.algorithm=="dag-shortest-path":
 	g.dag_shortest_path( args.vertex, args.prefix, blank=args.blank)
 	algorithm_str = "DAG Shortest Path"
 elif args.algorithm=="dag-longest-path":
-	g = pert.PERTGraph.from_dot( args.dotfile)
+	g = load_graph( args.dotfile, pert.PERTGraph )
 	g.dag_longest_path( args.vertex, args.prefix, blank=args.blank)
 	algorithm_str = "DAG Longest Path"
 elif args.vertex is not None:
 	g.breadth_first( args.vertex, args.prefix, blank=args.blank )
 	algorithm_str = "Breadth-First Search"
 
-#os.system('for i in {}*[0-9].dot; do ps=${{i%.dot}}.ps ; dot -Tps:cairo $i > $ps ; done'.format(args.prefix) )
-os.system('for i in {}*[0-9].dot; do pdf=${{i%.dot}}.pdf ; dot -Tpdf $i > $pdf ; done'.format(args.prefix) )
-
-diagrams = list( filter(lambda x: x.startswith(args.prefix) and x.endswith('.pdf'),   os.listdir()  ))
+# for PostScript output: RenderPool( command_renderer( (args.renderer,), 'ps:cairo' ), args.jobs, 'ps' )
+cache = None
+if args.cache is not None:
+	cache = RenderCache( args.cache, args.cache_size * 2**20, command_version( (args.renderer,) ))
+pool = RenderPool( command_renderer( (args.renderer,), 'pdf' ), args.jobs, 'pdf', cache )
+start = time.perf_counter()
+results = pool.render( sorted( glob.glob( glob.escape( args.prefix ) + '*[0-9].dot' )))
+if args.timing:
+	print( timing_report( results, time.perf_counter() - start ), file=sys.stderr )
+	if cache is not None:
+		print( cache.stats(), file=sys.stderr )
+
+diagrams = [ result.target for result in results ]
 
 
 preamble = """ \\documentclass{article}
@@ -0,0 +1,412 @@
+#!/usr/bin/python3
+
+"""
+Scaling benchmarks for the graph algorithms.
+
+Each benchmark runs an algorithm on graphs of increasing size and prints the running time per edge (or per operation): a roughly constant value across sizes means that the algorithm scales linearly.
+
+Ex.::
+
+	./benchmarks.py bfs -s 10000 100000 1000000 2000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from graph import *
+
+
+def vertex_labels(n):
+	""" Return n zero-padded vertex labels, whose lexicographic order matches their numeric order.
+
+	:param n: number of labels
+	:type n: int
+	:rtype: list
+	"""
+	width = len(str(n))
+	return [ 'v{:0{}}'.format(i, width) for i in range(n) ]
+
+def make_random_digraph(m, degree=4, seed=0):
+	""" A random directed graph with m edges and the given out-degree.
+
+	:param m: number of edges
+	:type m: int
+	:param degree: out-degree of every vertex
+	:type degree: int
+	:rtype: Graph
+	"""
+	rnd = random.Random(seed)
+	n = max(2, m // degree)
+	labels = vertex_labels(n)
+	edges = [ (labels[i], labels[rnd.randrange(n)]) for i in range(n) for d in range(degree) ]
+	# make sure that every vertex is reachable from the first one
+	edges.extend( (labels[i], labels[i+1]) for i in range(n-1) )
+	return Graph( labels, edges, directed=True )
+
+def make_random_dag(n, degree=4, seed=0):
+	""" A random weighted DAG with n vertices: every vertex has edges to (at most) `degree` vertices that come later in label order.
+
+	:param n: number of vertices
+	:type n: int
+	:param degree: out-degree of every vertex
+	:type degree: int
+	:rtype: Graph
+	"""
+	rnd = random.Random(seed)
+	labels = vertex_labels(n)
+	edges = [ (labels[i], labels[rnd.randrange(i+1, n)], rnd.randint(-5, 20)) for i in range(n-1) for d in range(degree) ]
+	return Graph( labels, edges, directed=True )
+
+def make_grid_graph(n, max_weight=10, seed=0):
+	""" A road-like undirected graph: a square grid with about n vertices, and random positive weights. Vertex coordinates are set to the grid positions.
+
+	:param n: number of vertices
+	:type n: int
+	:param max_weight: edge weights are picked in [1, max_weight]
+	:type max_weight: int
+	:return: the graph and the side of the grid
+	:rtype: tuple
+	"""
+	rnd = random.Random(seed)
+	side = max(2, int(n**.5))
+	labels = vertex_labels(side*side)
+	edges = []
+	for r in range(side):
+		for c in range(side):
+			i = r*side+c
+			if c+1 < side:
+				edges.append( (labels[i], labels[i+1], rnd.randint(1, max_weight)) )
+			if r+1 < side:
+				edges.append( (labels[i], labels[i+side], rnd.randint(1, max_weight)) )
+	g = Graph( labels, edges )
+	for i, label in enumerate(labels):
+		g.V[label].coord = (i % side, i // side)
+	return (g, side)
+
+def timed(function, *args, **kwargs):
+	""" Run a function and return the elapsed time (in seconds). """
+	start = time.perf_counter()
+	function(*args, **kwargs)
+	return time.perf_counter() - start
+
+def report(name, size, edges, seconds):
+	print('{:<12} |V|={:<10} |E|={:<10} {:>8.3f}s {:>10.1f} ns/edge'.format(name, size, edges, seconds, 1e9*seconds/max(edges,1)))
+
+
+def bench_bfs(sizes):
+	""" Breadth-first search on random digraphs with a wide frontier. """
+	for m in sizes:
+		g = make_random_digraph( m )
+		edges = sum( len(l) for l in g.Adj.values() )
+		report('bfs', len(g.V), edges, timed( g.breadth_first, next(iter(g.V)) ))
+
+def bench_dag(sizes):
+	""" DAG shortest paths (topological sort + relaxation), on random DAGs with |V| = size. """
+	for n in sizes:
+		g = make_random_dag( n )
+		edges = sum( len(l) for l in g.Adj.values() )
+		report('dag-sp', len(g.V), edges, timed( g.dag_shortest_path, next(iter(g.V)) ))
+
+def bench_dijkstra(sizes):
+	""" Dijkstra's algorithm on random weighted DAGs with |V| = size: MinHeap vs. IndexedMinHeap of arity 2, 4, 8, and a detached query (no Vertex attribute). """
+	for n in sizes:
+		g = make_random_dag( n )
+		for (u, row) in g.Matrix.items():
+			for v in row:
+				row[v] = abs(row[v])
+		edges = sum( len(l) for l in g.Adj.values() )
+		source = next(iter(g.V))
+		report('dijkstra', len(g.V), edges, timed( g.dijkstra, source ))
+		for arity in (2, 4, 8):
+			report('dijkstra/{}'.format(arity), len(g.V), edges, timed( g.dijkstra, source, arity=arity ))
+		# repeated queries: the array-backed view is built once
+		g.frozen_view()
+		report('dijkstra-det', len(g.V), edges, timed( g.dijkstra, source, detached=True ))
+
+class Item(object):
+	""" A queue entry for the heap benchmark. """
+	def __init__(self, key):
+		self.key = key
+
+	def __gt__(self, other):
+		return self.key > other.key
+
+def heap_violations(h):
+	""" Number of positions where a MaxHeap/MinHeap violates the heap property, or holds a wrong index entry. """
+	return sum( 1 for i in range(1, h.size) if h._compare( h.array[i], h.array[ h.parent(i) ] )) + \
+		sum( 1 for i in range(h.size) if h.index[ h.array[i] ] != i )
+
+def indexed_heap_violations(h):
+	""" Number of positions where an IndexedMinHeap violates the heap property, or holds a wrong position. """
+	return sum( 1 for i in range(1, len(h.heap)) if h.keys[ h.heap[i] ] < h.keys[ h.heap[ (i-1)//h.arity ]] ) + \
+		sum( 1 for i in range(len(h.heap)) if h.position[ h.heap[i] ] != i )
+
+def bench_heap(sizes, checks=10, seed=0):
+	""" Random mix of extract-min (1/3) and decrease-key (2/3) operations, with `size` operations in total; the heap invariants are checked at regular intervals (outside of the timed sections). """
+	for ops in sizes:
+		n = ops // 2 + 1
+		rnd = random.Random(seed)
+		script = [ rnd.random() < 1/3 for i in range(ops) ]
+		keys = [ rnd.randint(0, 10**6) for i in range(n) ]
+
+		# MinHeap: keys are decreased in place, then floated up
+		h = MinHeap( [ Item(k) for k in keys ] )
+		elapsed, violations = 0, 0
+		for chunk in range(checks):
+			start = time.perf_counter()
+			for extract in script[ chunk*ops//checks:(chunk+1)*ops//checks ]:
+				if extract:
+					h.extract_min()
+				else:
+					item = h.array[ rnd.randrange(h.size) ]
+					item.key -= rnd.randint(0, 1000)
+					h.float_item( item )
+			elapsed += time.perf_counter() - start
+			violations += heap_violations( h )
+		print('{:<12} ops={:<10} {:>8.3f}s {:>10.1f} ns/op   violations={}'.format('MinHeap', ops, elapsed, 1e9*elapsed/ops, violations))
+
+		for arity in (2, 4, 8):
+			h = IndexedMinHeap( arity )
+			handles = [ h.push( None, k ) for k in keys ]
+			elapsed, violations = 0, 0
+			for chunk in range(checks):
+				start = time.perf_counter()
+				for extract in script[ chunk*ops//checks:(chunk+1)*ops//checks ]:
+					if extract:
+						h.extract_min_handle()
+					else:
+						handle = h.heap[ rnd.randrange(len(h)) ]
+						h.decrease_key( handle, h.keys[handle] - rnd.randint(0, 1000) )
+				elapsed += time.perf_counter() - start
+				violations += indexed_heap_violations( h )
+			print('{:<12} ops={:<10} {:>8.3f}s {:>10.1f} ns/op   violations={}'.format('Indexed/{}'.format(arity), ops, elapsed, 1e9*elapsed/ops, violations))
+
+def bench_p2p(sizes, queries=5, seed=0):
+	""" Point-to-point queries on grid graphs with |V| = size: full Dijkstra vs. Dijkstra with a target (lazy queue, early exit) vs. bidirectional Dijkstra, for targets at 1/8 of the grid side from the source. """
+	rnd = random.Random(seed)
+	for n in sizes:
+		g, side = make_grid_graph( n )
+		labels = list(g.V)
+		edges = sum( len(l) for l in g.Adj.values() )
+		center = (side//2)*side + side//2
+		source = labels[ center ]
+		radius = max(1, side//8)
+		targets = [ labels[ center + rnd.randint(-radius, radius)*side + rnd.randint(-radius, radius) ] for q in range(queries) ]
+		report('dijkstra', len(g.V), edges, sum( timed( g.dijkstra, source ) for t in targets )/queries )
+		report('dijkstra/t', len(g.V), edges, sum( timed( g.dijkstra, source, target=t ) for t in targets )/queries )
+		report('bidir', len(g.V), edges, sum( timed( g.bidirectional_dijkstra, source, t ) for t in targets )/queries )
+
+def bench_astar(sizes, queries=5, seed=0):
+	""" A* (Manhattan and Euclidean heuristics) vs. point-to-point Dijkstra on grid graphs with |V| = size and weights in [1,2], for random targets: running time and number of settled vertices. """
+	rnd = random.Random(seed)
+	for n in sizes:
+		g, side = make_grid_graph( n, max_weight=2 )
+		labels = list(g.V)
+		source = labels[0]
+		targets = [ labels[ rnd.randrange(len(labels)) ] for q in range(queries) ]
+		elapsed, settled = 0, 0
+		for t in targets:
+			elapsed += timed( g.dijkstra, source, target=t )
+			settled += sum( 1 for v in g.V.values() if v.color == Vertex.BLACK )
+		print('{:<12} |V|={:<10} {:>8.3f}s  settled={}'.format('dijkstra/t', len(g.V), elapsed/queries, settled//queries))
+		for heuristic in ('manhattan', 'euclidean'):
+			elapsed, settled = 0, 0
+			for t in targets:
+				start = time.perf_counter()
+				settled += g.a_star( source, t, heuristic )[1]
+				elapsed += time.perf_counter() - start
+			print('{:<12} |V|={:<10} {:>8.3f}s  settled={}'.format('a*/'+heuristic, len(g.V), elapsed/queries, settled//queries))
+
+def bench_multi(sizes, sources=64):
+	""" Multi-source shortest paths on random DAGs with |V| = size: throughput with 1, 2, 4, ... worker processes (up to the number of CPUs). """
+	for n in sizes:
+		g = make_random_dag( n )
+		for (u, row) in g.Matrix.items():
+			for v in row:
+				row[v] = abs(row[v])
+		labels = list(g.V)[:sources]
+		workers = 1
+		while workers <= (os.cpu_count() or 1):
+			elapsed = timed( g.shortest_paths_from, labels, workers=workers )
+			print('{:<12} |V|={:<10} workers={:<3} {:>8.3f}s {:>8.1f} sources/s'.format('multi', len(g.V), workers, elapsed, len(labels)/elapsed))
+			workers *= 2
+
+def bench_apsp(sizes, densities=(.005, .05)):
+	""" All-pairs shortest paths on random digraphs with |V| = size and |E| = density * |V|^2: Floyd-Warshall vs. Johnson. The distance matrices take 8 |V|^2 bytes each: keep the sizes to a few thousand vertices. """
+	if np is None:
+		print('apsp: NumPy is not installed')
+		return
+	for n in sizes:
+		for density in densities:
+			g = make_random_digraph( int(density*n*n), degree=max(1, int(density*n)) )
+			for (u, row) in g.Matrix.items():
+				for v in row:
+					row[v] = random.randint(1, 20)
+			f = g.freeze()
+			for method in ('floyd-warshall', 'johnson'):
+				report('apsp-' + method[0:2], len(f), len(f.targets), timed( f.all_pairs_shortest_paths, method ))
+
+def bench_dot(sizes):
+	""" Loading a DOT file with `size` edges (as written by Graph.to_dot, with weights): parsing only (DotReader), and parsing + building the graph (Graph.from_dot). """
+	for m in sizes:
+		g = make_random_digraph( m )
+		for (u, row) in g.Matrix.items():
+			for v in row:
+				row[v] = random.randint(1, 20)
+		g.weighted = True
+		with tempfile.TemporaryDirectory() as tmp:
+			dotfile = os.path.join( tmp, 'graph.dot' )
+			with open( dotfile, 'w' ) as out:
+				out.write( g.to_dot( Walk.BFS ))
+			megabytes = os.path.getsize( dotfile ) / 2**20
+			edges = sum( len(l) for l in g.Adj.values() )
+			del g
+
+			def parse():
+				with open( dotfile ) as stream:
+					for edge in DotReader( stream ).edges():
+						pass
+			for (name, function) in (('dot-parse', parse), ('dot-load', lambda: Graph.from_dot( dotfile ))):
+				seconds = timed( function )
+				report( name, m // 4, edges, seconds )
+				print('{:<12} {:>8.1f} MB {:>8.1f} MB/s'.format('', megabytes, megabytes/seconds))
+
+def bench_to_dot(sizes):
+	""" Writing a snapshot (Graph.to_dot) of a random digraph, and of an undirected grid, with `size` edges. """
+	for m in sizes:
+		g = make_random_digraph( m )
+		report('to_dot', len(g.V), sum( len(l) for l in g.Adj.values() ), timed( g.to_dot, Walk.BFS ))
+		g, side = make_grid_graph( m // 2 )
+		report('to_dot-grid', len(g.V), sum( len(l) for l in g.Adj.values() ) // 2, timed( g.to_dot, Walk.BFS ))
+
+def record_frames(g):
+	""" Record one frame per vertex, as a traversal would: the vertex is finished, and its successors are updated. """
+	recorder = FrameRecorder( g, Walk.BFS )
+	for i, u in enumerate( g.V.values() ):
+		u.color = Vertex.BLACK
+		for v in g.Adj[u]:
+			v.pi = u
+		recorder.touch( u, *g.Adj[u] )
+		recorder.frame( i )
+	return recorder
+
+def bench_frames(sizes):
+	""" Recording step-by-step snapshots (FrameRecorder) of a random digraph with `size` edges: one frame per vertex. """
+	for m in sizes:
+		g = make_random_digraph( m )
+		report('frames', len(g.V), sum( len(l) for l in g.Adj.values() ), timed( record_frames, g ))
+
+def bench_sinks(sizes, frames=200):
+	""" Writing the snapshots of a BFS on a random digraph with `size` edges (its first 200 frames), to a directory, to an archive, and to memory. """
+	for m in sizes:
+		g = make_random_digraph( m )
+		recorder = record_frames( g )
+		recorder.deltas = recorder.deltas[:frames]
+		edges = sum( len(l) for l in g.Adj.values() )
+		with tempfile.TemporaryDirectory() as tmp:
+			report('sink-dir', len(g.V), edges, timed( recorder.write, os.path.join( tmp, 'bfs_' )))
+			with ArchiveSink( os.path.join( tmp, 'bfs.tar' )) as sink:
+				report('sink-tar', len(g.V), edges, timed( recorder.write, sink ))
+			report('sink-memory', len(g.V), edges, timed( recorder.write, MemorySink() ))
+
+def bench_binary(sizes):
+	""" Opening a graph with `size` edges: parsing its DOT file (Graph.from_dot), vs. loading its binary snapshot (Graph.load_binary), with and without mmap. """
+	for m in sizes:
+		g = make_random_digraph( m )
+		for (u, row) in g.Matrix.items():
+			for v in row:
+				row[v] = random.randint(1, 20)
+		g.weighted = True
+		with tempfile.TemporaryDirectory() as tmp:
+			dotfile = os.path.join( tmp, 'graph.dot' )
+			binfile = os.path.join( tmp, 'graph.bin' )
+			with open( dotfile, 'w' ) as out:
+				out.write( g.to_dot( Walk.BFS ))
+			g.save_binary( binfile )
+			edges = sum( len(l) for l in g.Adj.values() )
+			del g
+			report('from_dot', m // 4, edges, timed( Graph.from_dot, dotfile ))
+			report('load-mmap', m // 4, edges, timed( Graph.load_binary, binfile ))
+			report('load-read', m // 4, edges, timed( Graph.load_binary, binfile, mmap=False ))
+
+class DictVertex(object):
+	""" The former Vertex layout, with a per-instance dictionary (for the memory benchmark). """
+	def __init__(self, label):
+		self.label = label
+		self.short_label = label[0]
+		self.distance = Vertex.INFTY
+		self.pi = None
+		self.color = Vertex.WHITE
+		self.discovery = 0
+		self.finish = 0
+		self.coord = (0,0)
+
+	def __gt__(self, other):
+		return (self.distance, self.label) > (other.distance, other.label)
+
+def allocated(build):
+	""" Return the number of bytes allocated by a function (the objects it returns are kept alive during the measure). """
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	result = build()
+	after = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	return after - before
+
+def bench_memory(sizes):
+	""" Bytes per vertex, with `size` vertices: the former dictionary-based vertex (decorated with heap, heap_index and float_key by the priority queue), vs. the slotted Vertex (positions tracked by the queue). """
+	for n in sizes:
+		labels = vertex_labels(n)
+
+		def old_layout():
+			vertices = [ DictVertex(label) for label in labels ]
+			for idx, v in enumerate(vertices):
+				v.heap_index = idx
+				v.heap = vertices
+				v.float_key = lambda x: x
+			return vertices
+
+		def new_layout():
+			vertices = [ Vertex(label, idx) for idx, label in enumerate(labels) ]
+			return (vertices, MinHeap( vertices ))
+
+		old = allocated( lambda: [ DictVertex(label) for label in labels ] )
+		old_queued = allocated( old_layout )
+		new = allocated( lambda: [ Vertex(label, idx) for idx, label in enumerate(labels) ] )
+		new_queued = allocated( new_layout )
+		print('{:<12} |V|={:<10} before: {:>6.1f} B/vertex ({:>6.1f} queued)   after: {:>6.1f} B/vertex ({:>6.1f} queued)'.format(
+			'memory', n, old/n, old_queued/n, new/n, new_queued/n))
+
+
+benchmarks = {
+	'bfs': bench_bfs,
+	'dag': bench_dag,
+	'dijkstra': bench_dijkstra,
+	'heap': bench_heap,
+	'p2p': bench_p2p,
+	'astar': bench_astar,
+	'multi': bench_multi,
+	'apsp': bench_apsp,
+	'dot': bench_dot,
+	'binary': bench_binary,
+	'to_dot': bench_to_dot,
+	'frames': bench_frames,
+	'sinks': bench_sinks,
+	'memory': bench_memory,
+}
+
+def main():
+	parser=argparse.ArgumentParser()
+	parser.add_argument("benchmark", help="The benchmark to run", choices=sorted(benchmarks.keys()) + ['all'])
+	parser.add_argument("-s", "--sizes", type=int, nargs='+', default=[10**4, 10**5, 10**6], help="Graph sizes (number of edges for bfs, dot, binary, to_dot, frames and sinks, number of vertices for dag, dijkstra, p2p, astar, multi, apsp and memory, number of operations for heap)")
+	args = parser.parse_args()
+
+	for name in (sorted(benchmarks.keys()) if args.benchmark == 'all' else [ args.benchmark ]):
+		benchmarks[name]( args.sizes )
+
+if __name__ == '__main__':
+	main()
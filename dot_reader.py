@@ -0,0 +1,417 @@
+#!/usr/bin/python3
+
+"""
+A streaming reader for graph files in the DOT language.
+
+The file is read by chunks, and tokenized as it goes: statements may span several lines, or share a line; IDs may be quoted (or HTML strings); node and edge statements may carry attribute lists; subgraph blocks may be nested, and used as edge operands (`a -> {b c}`).
+
+Vertices and edges are passed on to the caller as soon as they are read, so that the memory used by the reader does not depend on the size of the file (only the set of vertex labels is kept).
+
+Ex.::
+
+	with open('examples/weighted_dag.dot') as dotfile:
+		reader = DotReader( dotfile )
+		for (u, v, attributes) in reader.edges():
+			print(u, v, attributes.get('label'))
+		print(reader.directed, reader.vertices)
+"""
+
+import unittest
+import io
+import re
+
+
+class DotSyntaxError( Exception ): pass
+
+
+# unquoted IDs that are keywords of the language (case-insensitive)
+KEYWORDS = ('strict', 'graph', 'digraph', 'node', 'edge', 'subgraph')
+
+_id = r'[A-Za-z_\x80-\uffff][\w\x80-\uffff]*|-?(?:\.\d+|\d+(?:\.\d*)?)'
+_quoted = r'"(?:[^"\\]|\\.)*"'
+
+# the general tokenizer: one token at a time
+token_re = re.compile(r'''
+	(?P<skip>(?:\s+|//[^\n]*|\#[^\n]*|/\*.*?\*/)+)
+	|(?P<edgeop>->|--)
+	|(?P<id>{})
+	|(?P<quoted>{})
+	|(?P<punct>[{{}}\[\]=;,:+<])
+	'''.format( _id, _quoted ), re.VERBOSE | re.DOTALL)
+
+# the fast path, at the start of a statement: a whole node or edge statement, with simple IDs
+# and a single attribute list, is matched at once
+_simple_attributes = r'(?:\[([^\]"]*(?:"[^"\\]*"[^\]"]*)*)\]\s*)?'
+node_statement_re = re.compile(r'\s*({0})\s*{1};'.format( _id, _simple_attributes ))
+edge_statement_re = re.compile(r'\s*({0})\s*(->|--)\s*({0})\s*{1};'.format( _id, _simple_attributes ))
+
+attribute_re = re.compile(r'({0}|{1})\s*=\s*({0}|{1})\s*[,;]?\s*'.format( _id, _quoted ))
+
+
+def unquote(string):
+	""" The value of a quoted DOT string: escaped quotes are unescaped, and escaped newlines are removed; other escape sequences (ex. `\\n` in labels) are left to the renderer.
+
+	:param string: a string, with its enclosing double quotes
+	:type string: str
+	:rtype: str
+	"""
+	return string[1:-1].replace('\\"', '"').replace('\\\n', '').replace('\\\r\n', '')
+
+def parse_attributes(text, attributes=None):
+	"""
+	Parse the content of a simple attribute list (no HTML strings), ex. `label="7", penwidth=3`.
+
+	:param text: the text between the brackets
+	:type text: str
+	:param attributes: a dictionary to be updated (a new one is created if None)
+	:type attributes: dict
+	:return: the dictionary of attributes
+	:rtype: dict
+	"""
+	if attributes is None:
+		attributes = {}
+	for (name, value) in attribute_re.findall( text ):
+		if name[0] == '"':
+			name = unquote( name )
+		if value[0] == '"':
+			value = unquote( value )
+		attributes[ name ] = value
+	return attributes
+
+
+class DotReader():
+	""" A streaming DOT parser.
+
+	The header of the graph (`[strict] (graph|digraph) [ID] {`) is read when the reader is created; the statements are read as the :meth:`edges` generator is consumed. Only the first graph of the file is read.
+
+	- `directed`: True for a digraph
+	- `strict`: True for a strict graph
+	- `name`: the graph ID (None if the graph is anonymous)
+	- `vertices`: the labels of the vertices read so far, in order of first appearance (either in a node statement, or in an edge)
+	"""
+
+	def __init__(self, stream, chunk_size=2**20):
+		"""
+		:param stream: a text stream (an open file, or a StringIO)
+		:type stream: io.TextIOBase
+		:param chunk_size: number of characters read at once
+		:type chunk_size: int
+		"""
+		self.stream = stream
+		self.chunk_size = chunk_size
+		self.directed = False
+		self.strict = False
+		self.name = None
+		self.vertices = []
+		self._known = set()
+		# parsed attribute lists of the fast path, by text
+		self._attribute_cache = {}
+		# one-token pushback for the parser
+		self._pending = None
+		self._tokens = self._tokenize()
+
+		kind, value = self._next()
+		if kind == 'strict':
+			self.strict = True
+			kind, value = self._next()
+		if kind not in ('graph', 'digraph'):
+			raise DotSyntaxError('Expected "graph" or "digraph", found: {}'.format(value))
+		self.directed = ( kind == 'digraph' )
+		kind, value = self._next()
+		if kind == 'id':
+			self.name = value
+			kind, value = self._next()
+		if kind != '{':
+			raise DotSyntaxError('Expected "{{", found: {}'.format(value))
+
+	def _tokenize(self):
+		""" Generate the tokens of the stream, as (kind, value) pairs: the kind is 'id', 'edgeop', a keyword, or a punctuation character; at the start of a statement, it can also be 'statements' (a list of whole node and edge statements, as (label, attributes) or (tail, op, head, attributes) tuples).
+
+		The buffer is refilled whenever a token may be cut by its end.
+		"""
+		buf, pos, eof = '', 0, False
+		refill = 2**16
+		# the previous token ends a statement: try the fast path
+		statement_start = False
+		while True:
+			if not eof and len(buf) - pos < refill:
+				chunk = self.stream.read( self.chunk_size )
+				buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+
+			if statement_start:
+				# a run of simple statements, up to the first one that does not match (or is cut by the end of the buffer)
+				statements = []
+				while True:
+					m = edge_statement_re.match( buf, pos )
+					if m is None:
+						m = node_statement_re.match( buf, pos )
+						if m is None:
+							break
+					if m.group(1).lower() in KEYWORDS:
+						break
+					statements.append( m.groups() )
+					pos = m.end()
+				if statements:
+					yield ('statements', statements)
+					continue
+
+			m = token_re.match( buf, pos )
+			if m is None or (m.end() == len(buf) and not eof):
+				if not eof and (m is not None or buf[pos] in '"/'):
+					# the token (or a string, or a comment) may be cut by the end of the buffer
+					chunk = self.stream.read( self.chunk_size )
+					buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+					continue
+				if pos == len(buf):
+					return
+				raise DotSyntaxError('Unexpected input: {}'.format( buf[pos:pos+40] ))
+			pos = m.end()
+			kind = m.lastgroup
+			if kind == 'skip':
+				continue
+			value = m.group()
+			if kind == 'id':
+				keyword = value.lower()
+				if keyword in KEYWORDS:
+					kind = keyword
+			elif kind == 'quoted':
+				kind, value = 'id', unquote( value )
+			elif kind == 'punct':
+				kind = value
+				if value == '<':
+					# an HTML string: up to the matching '>'
+					depth, end = 1, pos
+					while depth:
+						if end == len(buf):
+							if eof:
+								raise DotSyntaxError('Unterminated HTML string')
+							chunk = self.stream.read( self.chunk_size )
+							buf, eof = buf + chunk, not chunk
+							continue
+						c = buf[end]
+						depth += (c == '<') - (c == '>')
+						end += 1
+					kind, value, pos = 'id', buf[pos:end-1], end
+			# the fast path may start right after a whole statement
+			statement_start = kind in ('{', '}', ';')
+			yield (kind, value)
+
+	def _next(self):
+		if self._pending is not None:
+			token, self._pending = self._pending, None
+			return token
+		return next( self._tokens, ('eof', 'end of file') )
+
+	def _peek(self):
+		if self._pending is None:
+			self._pending = next( self._tokens, ('eof', 'end of file') )
+		return self._pending
+
+	def _vertex(self, label):
+		if label not in self._known:
+			self._known.add( label )
+			self.vertices.append( label )
+		return label
+
+	def edges(self):
+		"""
+		Read the statements of the graph, and generate its edges.
+
+		Edge chains (`a -> b -> c`) and subgraph operands (`a -> {b c}`) are expanded into single edges. Attribute assignments (`graph [...]`, `node [...]`, `x=y`) are skipped, except for the default edge attributes (`edge [...]`), which apply to the edges that follow them, in the enclosing block.
+
+		:return: a generator of (tail, head, attributes) triples, where attributes is a dictionary
+		"""
+		yield from self._statement_list( {}, None )
+
+	def _statement_list(self, defaults, nodes):
+		""" Read statements up to the closing brace of the current block.
+
+		:param defaults: the default edge attributes of the block
+		:type defaults: dict
+		:param nodes: a list, to which the vertices that appear in the block are appended (for subgraph operands), or None
+		:type nodes: list
+		:return: a generator of edges
+		"""
+		known, vertices, cache = self._known, self.vertices, self._attribute_cache
+		while True:
+			kind, value = self._next()
+			if kind == '}':
+				return
+			if kind == ';':
+				continue
+			if kind == 'eof':
+				raise DotSyntaxError('Missing closing brace')
+
+			if kind == 'statements':
+				# fast path
+				for statement in value:
+					if len(statement) == 2:
+						label = statement[0]
+						if label not in known:
+							known.add( label )
+							vertices.append( label )
+						if nodes is not None:
+							nodes.append( label )
+						continue
+					tail, op, head, text = statement
+					if tail not in known:
+						known.add( tail )
+						vertices.append( tail )
+					if head not in known:
+						known.add( head )
+						vertices.append( head )
+					if nodes is not None:
+						nodes.append( tail )
+						nodes.append( head )
+					attributes = dict( defaults )
+					if text:
+						# most edges share a few attribute lists: parse each of them once
+						parsed = cache.get( text )
+						if parsed is None:
+							if len(cache) >= 1024:
+								cache.clear()
+							parsed = cache[text] = parse_attributes( text )
+						attributes.update( parsed )
+					yield (tail, head, attributes)
+			elif kind in ('graph', 'node', 'edge'):
+				attributes = self._attribute_lists()
+				if kind == 'edge':
+					defaults.update( attributes )
+			elif kind == 'id' and self._peek()[0] == '=':
+				# graph attribute
+				self._next()
+				self._id( self._next() )
+			else:
+				operand = yield from self._operand( kind, value, defaults )
+				if nodes is not None:
+					nodes.extend( operand )
+				if self._peek()[0] != 'edgeop':
+					# node statement
+					self._attribute_lists()
+					continue
+				operands = [ operand ]
+				while self._peek()[0] == 'edgeop':
+					self._next()
+					kind, value = self._next()
+					operand = yield from self._operand( kind, value, defaults )
+					if nodes is not None:
+						nodes.extend( operand )
+					operands.append( operand )
+				attributes = dict( defaults )
+				attributes.update( self._attribute_lists() )
+				for i in range( len(operands)-1 ):
+					for tail in operands[i]:
+						for head in operands[i+1]:
+							yield (tail, head, dict( attributes ))
+
+	def _operand(self, kind, value, defaults):
+		""" Read a node ID (with an optional port) or a subgraph.
+
+		:return: a generator of edges (the subgraph statements); its return value is the list of vertices of the operand
+		"""
+		if kind in ('subgraph', '{'):
+			if kind == 'subgraph':
+				if self._peek()[0] == 'id':
+					self._next()
+				kind, value = self._next()
+				if kind != '{':
+					raise DotSyntaxError('Expected "{{" after "subgraph", found: {}'.format(value))
+			nodes = []
+			yield from self._statement_list( dict( defaults ), nodes )
+			return nodes
+		label = self._vertex( self._id( (kind, value) ))
+		# ports (`a:port` or `a:port:compass`) are ignored
+		while self._peek()[0] == ':':
+			self._next()
+			self._id( self._next() )
+		return [ label ]
+
+	def _id(self, token):
+		""" Read an ID, including the concatenations of quoted strings (`"a" + "b"`). """
+		kind, value = token
+		if kind != 'id':
+			raise DotSyntaxError('Expected an ID, found: {}'.format(value))
+		while self._peek()[0] == '+':
+			self._next()
+			value += self._id( self._next() )
+		return value
+
+	def _attribute_lists(self):
+		""" Read a sequence of attribute lists (`[a=b, c=d][e=f]`), if any.
+
+		:rtype: dict
+		"""
+		attributes = {}
+		while self._peek()[0] == '[':
+			self._next()
+			while True:
+				kind, value = self._next()
+				if kind == ']':
+					break
+				if kind in (',', ';'):
+					continue
+				name = self._id( (kind, value) )
+				kind, value = self._next()
+				if kind != '=':
+					raise DotSyntaxError('Expected "=" after attribute {}, found: {}'.format(name, value))
+				attributes[ name ] = self._id( self._next() )
+		return attributes
+
+
+class DotReaderUnitTest( unittest.TestCase ):
+
+	def read(self, text, chunk_size=2**20):
+		reader = DotReader( io.StringIO( text ), chunk_size )
+		edges = [ (u, v, attributes.get('label')) for (u, v, attributes) in reader.edges() ]
+		return (reader, edges)
+
+	def test_one_statement_per_line(self):
+		reader, edges = self.read('Digraph {\na [label="a"];\nb [label="b"];\nc [label="c"];\n\na->b[label="5"];\nb->c[label="-1"];\n}\n')
+		self.assertTrue( reader.directed )
+		self.assertEqual( reader.vertices, ['a','b','c'] )
+		self.assertEqual( edges, [('a','b','5'), ('b','c','-1')] )
+
+	def test_statements_on_a_line(self):
+		reader, edges = self.read('graph G { a -- b; b -- c [label=2] c; d }')
+		self.assertFalse( reader.directed )
+		self.assertEqual( reader.name, 'G' )
+		self.assertEqual( reader.vertices, ['a','b','c','d'] )
+		self.assertEqual( edges, [('a','b',None), ('b','c','2')] )
+
+	def test_quoted_ids(self):
+		reader, edges = self.read('digraph { "x y" -> "say \\"hi\\"" [label="a ]; b"]; "con" + "cat" -> z; <<b>html</b>> -> z }')
+		self.assertEqual( reader.vertices, ['x y', 'say "hi"', 'concat', 'z', '<b>html</b>'] )
+		self.assertEqual( edges, [('x y', 'say "hi"', 'a ]; b'), ('concat','z',None), ('<b>html</b>', 'z', None)] )
+
+	def test_chains_and_subgraphs(self):
+		reader, edges = self.read('''strict digraph {
+			// comment
+			edge [label=1]
+			a -> b -> c /* comment */
+			subgraph cluster_0 { edge [label=2]; d -> e }
+			a -> { f; g }
+			h:p:n -> a
+			rankdir = LR; node [shape=box]
+		}''')
+		self.assertTrue( reader.strict )
+		self.assertEqual( edges, [('a','b','1'), ('b','c','1'), ('d','e','2'), ('a','f','1'), ('a','g','1'), ('h','a','1')] )
+		self.assertEqual( reader.vertices, ['a','b','c','d','e','f','g','h'] )
+
+	def test_chunk_boundaries(self):
+		""" Tokens cut by the end of a chunk """
+		text = 'digraph { ' + ' '.join( '"v{0}" -> w{0} [label="{0}", color=red];'.format(i) for i in range(50) ) + ' }'
+		expected = [ ('v{}'.format(i), 'w{}'.format(i), str(i)) for i in range(50) ]
+		for chunk_size in (1, 3, 7, 64):
+			self.assertEqual( self.read( text, chunk_size )[1], expected )
+
+	def test_syntax_errors(self):
+		for text in ('digraph { a -> b', 'digraph { a -> }', 'digraph { a [label] }', 'tree { }', 'digraph { "a }'):
+			with self.assertRaises( DotSyntaxError ):
+				self.read( text )
+
+
+def main():
+        unittest.main()
+
+if __name__ == '__main__':
+        main()
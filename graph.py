@@ -2,10 +2,31 @@
 
 import unittest
 import collections as clt
+import pickle
+import os
+import tempfile
+import zipfile
 
 from heap import *
 from enum import *
 import re
+import math
+import heapq
+import concurrent.futures
+import struct
+import sys
+import gc
+import warnings
+import mmap as mmap_module
+from array import array
+
+from dot_reader import DotReader, DotSyntaxError
+from snapshots import SnapshotSink, MemorySink, DirectorySink, ArchiveSink, make_sink
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
 
 
 
@@ -18,6 +39,51 @@ def log( string, level=1):
 
 class LabelException( Exception ): pass
 
+class NegativeCycleException( Exception ):
+	""" Raised by the shortest-path algorithms that detect a negative-weight cycle.
+
+	The labels of the vertices on the cycle are stored in the `cycle` attribute, in path order.
+	"""
+	def __init__(self, cycle):
+		super().__init__('Negative-weight cycle: {}'.format(' -> '.join( cycle )))
+		self.cycle = cycle
+
+
+def euclidean_distance(u, v):
+	""" Straight-line distance between the coordinates of two vertices (an A* heuristic). """
+	return math.hypot( u.x()-v.x(), u.y()-v.y() )
+
+def manhattan_distance(u, v):
+	""" Grid distance between the coordinates of two vertices (an A* heuristic). """
+	return abs( u.x()-v.x() ) + abs( u.y()-v.y() )
+
+heuristics = {
+	'euclidean': euclidean_distance,
+	'manhattan': manhattan_distance,
+}
+
+# an edge weight in a DOT label: an integer (of any size), a float, or infinity (`-inf` is matched, so as to be rejected by parse_weight())
+weight_pattern = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|[-+]?inf'
+
+weight_re = re.compile( weight_pattern )
+
+def parse_weight(string):
+	""" Convert an edge weight from its string representation: integers stay exact, whatever their size.
+
+	An infinite weight (`inf`, or a float that overflows) is accepted only if it is positive: the edge is then never relaxed. A negative infinite weight would make distances undefined (`inf + -inf` is NaN).
+
+	:param string: a string that matches `weight_pattern`
+	:type string: str
+	:rtype: int or float
+	:raises ValueError: if the weight is negative and infinite
+	"""
+	try:
+		return int( string )
+	except ValueError:
+		weight = float( string )
+	if weight == -math.inf:
+		raise ValueError('Invalid edge weight: {} (negative infinity)'.format( string ))
+	return weight
 
 class Walk(Enum):
 	BFS=0
@@ -26,25 +92,32 @@ class Walk(Enum):
 	DAGSP=3
 
 class Vertex():
-	""" A vertex definition."""
+	""" A vertex definition.
+
+	Vertices have a fixed set of attributes (no per-instance dictionary), which keeps large graphs compact: the priority queues keep track of vertex positions on their own side.
+	"""
 
 	# These constants can be referred to afterwards as follows:
 	#	Vertex.WHITE, Vertex.GRAY...
 	WHITE = 0
 	GRAY = 1
 	BLACK = 2
-	INFTY = 2**15
+	INFTY = math.inf
+
+	__slots__ = ('id', 'label', 'short_label', 'distance', 'pi', 'color', 'discovery', 'finish', 'coord')
 	
-	def __init__(self, label=''):
+	def __init__(self, label='', index=-1):
 		"""
 		Initialize a vertex
 		
-		:param index: position in the vertex array
+		:param index: position in the vertex array (a stable integer id)
 		:param label: human-friendly label
 		:type index: int
 		:type label: str
 		"""
 
+		self.id = index
+
 		# a label (the index itself, or a letter)		
 		self.label = label
 		self.short_label = label[0]
@@ -138,7 +211,7 @@ class Vertex():
 		:return: a copy of this vertex, with its attributes.
 		:rtype: Vertex
 		"""
-		v = Vertex( self.label )
+		v = Vertex( self.label, self.id )
 		v.short_label=v.short_label
 		v.color = self.color
 		v.distance = self.distance
@@ -187,14 +260,16 @@ class Graph():
 		# in the order they were inserted, which is convenient for testing
 		self.V = clt.OrderedDict()
 
-		for label in sorted(v):
-			self.V[label] = Vertex( label ) 
+		for index, label in enumerate(sorted(v)):
+			self.V[label] = Vertex( label, index ) 
 			
 		# List of adjacency lists:  list containg |V| lists
 		self.Adj  =  { vertex: [] for label, vertex in self.V.items() }
 
-		# matrix representation
-		self.Matrix = { v1: { v2: None for v2 in self.V.values() } for v1 in self.V.values() } 
+		# sparse matrix representation: Matrix[u] only maps the successors of u
+		# to the edge weights, so that memory stays proportional to |V|+|E|
+		# (use weight(u,v) for a lookup that tolerates missing edges)
+		self.Matrix = { vertex: {} for vertex in self.V.values() }
 
 		# Read the edges (pairs of labels) and create corresponding entries
 		# in Adj
@@ -216,20 +291,119 @@ class Graph():
 
 		self.directed = directed
 
+		# adjacency lists in label order, reverse adjacency lists, and
+		# array-backed view, computed on demand (see sorted_adjacency(),
+		# reverse_adjacency() and frozen_view())
+		self.sorted_adj = None
+		self.reverse_adj = None
+		self.frozen = None
+
 		self.time = 0
 	
 
-	def breadth_first(self,source, file_prefix='', blank=False ):
+	def add_vertex(self, label):
+		"""
+		Add a vertex to the graph, if there is no vertex with this label yet.
+
+		The new vertex is appended to `V`, with the next integer id: call :meth:`sort_vertices` after a series of insertions, to restore the label order.
+
+		:param label: a vertex label
+		:type label: str
+		:return: the vertex with this label
+		:rtype: Vertex
+		"""
+		v = self.V.get( label )
+		if v is None:
+			v = Vertex( label, len(self.V) )
+			self.V[label] = v
+			self.Adj[v] = []
+			self.Matrix[v] = {}
+			self.sorted_adj = None
+			self.reverse_adj = None
+			self.frozen = None
+		return v
+
+	def add_edge(self, u, v, weight=None):
+		"""
+		Add an edge to the graph (the missing vertices are created, as with :meth:`add_vertex`).
+
+		:param u: label of the first vertex
+		:type u: str
+		:param v: label of the second vertex
+		:type v: str
+		:param weight: the edge weight; if provided, the graph becomes a weighted graph.
+		"""
+		v1, v2 = self.add_vertex( u ), self.add_vertex( v )
+		self.Adj[ v1 ].append( v2 )
+		self.Matrix[ v1 ][ v2 ] = 1 if weight is None else weight
+		if not self.directed:
+			self.Adj[ v2 ].append( v1 )
+			self.Matrix[ v2 ][ v1 ] = 1 if weight is None else weight
+		if weight is not None:
+			self.weighted = True
+		self.sorted_adj = None
+		self.reverse_adj = None
+		self.frozen = None
+
+	def sort_vertices(self):
+		"""
+		Put the vertices back in label order (the order of a graph created in one go), and renumber them.
+		"""
+		self.V = clt.OrderedDict( (label, self.V[label]) for label in sorted( self.V ))
+		for index, v in enumerate( self.V.values() ):
+			v.id = index
+		self.Adj = { v: self.Adj[v] for v in self.V.values() }
+		self.Matrix = { v: self.Matrix[v] for v in self.V.values() }
+		self.frozen = None
+
+	def sorted_adjacency(self):
+		""" Return the adjacency lists, with each list in label order.
+
+		The traversals visit the neighbors of a vertex in label order, so that their results are deterministic: sorting every list once, and caching the result until the graph changes, saves a sort on every visit. Methods that modify the adjacency lists must reset the cache (`self.sorted_adj = None`).
+
+		:return: a dictionary that maps every vertex to a tuple of its neighbors, sorted by label
+		:rtype: dict
+		"""
+		if self.sorted_adj is None:
+			self.sorted_adj = { u: tuple(sorted( lst, key=lambda x: x.label)) for u, lst in self.Adj.items() }
+		return self.sorted_adj
+
+	def reverse_adjacency(self):
+		""" Return the reverse adjacency lists: for every vertex v, the list of the vertices u such that (u,v) is an edge.
+
+		As for :meth:`sorted_adjacency`, the result is cached until the graph changes.
+
+		:return: a dictionary that maps every vertex to a list of its predecessors
+		:rtype: dict
+		"""
+		if self.reverse_adj is None:
+			if not self.directed:
+				self.reverse_adj = self.Adj
+			else:
+				self.reverse_adj = { v: [] for v in self.V.values() }
+				for u, lst in self.Adj.items():
+					for v in lst:
+						self.reverse_adj[v].append( u )
+		return self.reverse_adj
+
+	def breadth_first(self,source, sink=None, blank=False, detached=False ):
 		""" Breadth-First search of the graph.
 
 		:param source: label or index of the source vertex 
 		:type source: str
-		:param file_prefix: if provided, the procedure generates .dot diagrams for each step; dot filenames concatenate this prefix with a number suffix.
-		:type file_prefix: str
+		:param sink: if provided, the procedure generates .dot diagrams for each step: a SnapshotSink, or a file prefix (dot filenames concatenate this prefix with a number suffix).
+		:type sink: SnapshotSink or str
 		:param blank: if True, the procedure generates only .dot templates for each step; the colors and attributes of the node are not shown.
 		:param blank: bool
+		:param detached: if True, the vertex attributes are left untouched (no reset either): the search runs on the array-backed view of the graph (:meth:`frozen_view`), and its results are returned in a SearchState, indexed by vertex id. Detached searches can share the graph, and run concurrently; they do not generate snapshots.
+		:type detached: bool
+		:return: in detached mode, the results of the search
+		:rtype: SearchState
 		"""
-		queue = []
+		if detached:
+			return self._detached( sink ).breadth_first( source )
+		# FIFO: enqueue on the right, dequeue on the left
+		queue = clt.deque()
 		s = self.V[source ]
 		s.distance = 0
 		s.color = Vertex.GRAY
@@ -239,104 +413,152 @@ class Graph():
 		def queue_string(q):
 			if blank:
 				return 'Q='
-			return 'Q={}'.format([vtx.label for vtx in q ])
+			# most recently enqueued vertex first
+			return 'Q={}'.format([vtx.label for vtx in reversed(q) ])
 	
 
 		file_number = 0
+		adj = self.sorted_adjacency()
 
-		if file_prefix!='':
-				file_number += self.to_dot_file( '{}{}'.format(file_prefix,file_number), legend=queue_string(queue), blank=blank)
+		recorder = None
+		if sink:
+			recorder = FrameRecorder( self, Walk.BFS, blank )
+			recorder.frame( file_number, queue_string(queue) )
+			file_number += 1
 		while queue:
-			u = queue.pop()
+			u = queue.popleft()
 			#print('Popping vertex {} with adjacency list: {}'.format(u.label, self.Adj[u]))
-			for v in sorted( self.Adj[ u ], key=lambda x: x.label):
+			for v in adj[ u ]:
 				log("\tVisiting vertex {}".format(v.label),3)
 				
 				if v.color == Vertex.WHITE:
 					v.color = Vertex.GRAY
 					v.distance = u.distance + 1
 					v.pi = u
-					queue.insert(0,v)
+					queue.append(v)
+					if recorder is not None:
+						recorder.touch( v )
 
 			u.color = Vertex.BLACK
 
-			if file_prefix!='':
-				file_number += self.to_dot_file( '{}{:02}'.format(file_prefix,file_number), legend=queue_string(queue), blank=blank)
+			if recorder is not None:
+				recorder.touch( u )
+				recorder.frame( file_number, queue_string(queue) )
+				file_number += 1
 
 
-		if file_prefix!='' and not blank:
-			self.get_tree().to_dot_file( '{}{:02}'.format(file_prefix,file_number), legend=queue_string(queue))
+		if recorder is not None:
+			if not blank:
+				recorder.add( file_number, self.get_tree().to_dot( Walk.BFS, legend=queue_string(queue)))
+			recorder.write( sink )
 
 			
 
-	def depth_first(self, file_prefix='', blank=False):
-		""" Depth-First search.
+	def depth_first_search(self, discovered=None, finished=None):
+		""" Depth-first search engine, shared by :meth:`depth_first` and :meth:`topo_sort`.
 
-		:param file_prefix: if provided, the procedure generates .dot diagrams for each step; dot filenames concatenate this prefix with a number suffix.
-		:type file_prefix: str
-		:param blank: if True, the procedure generates only .dot templates for each step; the colors and attributes of the node are not shown.
-		:param blank: bool
-		"""	
-		#log("Starting DFS...")
-		time = 0
-
-
-		def depth_first_visit(u, spacer=''):
-			""" Recursive procedure, for depth-first search
-
-			:param u: the vertex under examination
-			:type u: Vertex
-			"""
-			nonlocal time
-			time += 1	
+		The search uses an explicit stack of adjacency-list iterators instead of recursion, so that the depth of the DFS tree is not bounded by the interpreter's recursion limit. Vertices are visited in the same order as a recursive DFS would, and get the same discovery/finish time stamps.
 
+		:param discovered: an optional function, called with a vertex as an argument, right after this vertex has been discovered.
+		:type discovered: function
+		:param finished: an optional function, called with a vertex as an argument, right after this vertex has been finished.
+		:type finished: function
+		:return: the last time stamp
+		:rtype: int
+		"""
+		time = 0
+		adj = self.sorted_adjacency()
 
-			log(spacer+'depth_first_visit({}) at time {}:00'.format( u.label, time ),3)
-			u.discovery = time
-			u.color = Vertex.GRAY
-
-			if file_prefix != '':
-				self.to_dot_file( '{}{:02}'.format(file_prefix,time), Walk.DFS, blank=blank )
+		for root in self.V.values():
+			if root.color != Vertex.WHITE:
+				continue
 
-			for v in  sorted( self.Adj[ u ], key=lambda x: x.label):
-				if v.color == Vertex.WHITE:
-					v.pi = u
-					depth_first_visit( v, spacer+'\t' )
-					
-			u.color = Vertex.BLACK
-			#print('{}.color={}'.format( u.label, u.color))
 			time += 1
-			u.finish = time
+			root.discovery = time
+			root.color = Vertex.GRAY
+			if log_level >= 3:
+				log('depth_first_visit({}) at time {}:00'.format( root.label, time ),3)
+			if discovered is not None:
+				discovered( root )
+
+			# each stack frame: a vertex, and an iterator over its remaining neighbors
+			stack = [ (root, iter(adj[ root ])) ]
+			while stack:
+				u, neighbors = stack[-1]
+				for v in neighbors:
+					if v.color == Vertex.WHITE:
+						v.pi = u
+						time += 1
+						v.discovery = time
+						v.color = Vertex.GRAY
+						if log_level >= 3:
+							log('\t'*len(stack) + 'depth_first_visit({}) at time {}:00'.format( v.label, time ),3)
+						if discovered is not None:
+							discovered( v )
+						stack.append( (v, iter(adj[ v ])) )
+						break
+				else:
+					# all neighbors of u have been explored
+					stack.pop()
+					u.color = Vertex.BLACK
+					time += 1
+					u.finish = time
+					if finished is not None:
+						finished( u )
+					if log_level >= 3:
+						log('\t'*len(stack) + 'finish {} at time {}:00'.format( u.label, time ),3)
+		return time
+
+	def depth_first(self, sink=None, blank=False, detached=False):
+		""" Depth-First search.
 
-			if file_prefix != '':
-				self.to_dot_file( '{}{:02}'.format(file_prefix,time), Walk.DFS, blank=blank )
+		:param sink: if provided, the procedure generates .dot diagrams for each step: a SnapshotSink, or a file prefix (dot filenames concatenate this prefix with a number suffix).
+		:type sink: SnapshotSink or str
+		:param blank: if True, the procedure generates only .dot templates for each step; the colors and attributes of the node are not shown.
+		:param blank: bool
+		:param detached: if True, the vertex attributes are left untouched (no reset either): the search runs on the array-backed view of the graph (:meth:`frozen_view`), and its results are returned in a SearchState, indexed by vertex id. Detached searches can share the graph, and run concurrently; they do not generate snapshots.
+		:type detached: bool
+		:return: in detached mode, the results of the search
+		:rtype: SearchState
+		"""	
+		if detached:
+			return self._detached( sink ).depth_first()
+		#log("Starting DFS...")
 
-			log(spacer+'finish {} at time {}:00'.format( u.label, time ),3)
+		def snapshot(u, time):
+			recorder.touch( u )
+			recorder.frame( time )
 
-		for v in self.V.values():
-			if v.color == Vertex.WHITE:
-				depth_first_visit( v, '')
+		if sink:
+			recorder = FrameRecorder( self, Walk.DFS, blank )
+			time = self.depth_first_search( lambda u: snapshot(u, u.discovery), lambda u: snapshot(u, u.finish) )
+		else:
+			time = self.depth_first_search()
 	
-		if not blank and file_prefix != '':
-			self.to_dot_file( '{}{:02}'.format(file_prefix,time), Walk.DFS, blank=blank)
-
-			self.get_tree().to_dot_file( '{}{:02}'.format(file_prefix,time+1), Walk.DFS, blank=blank)
+		if sink:
+			if not blank:
+				recorder.frame( time )
+				recorder.add( time+1, self.get_tree().to_dot( Walk.DFS ))
+			recorder.write( sink )
 	
 
-	def topo_sort(self, file_prefix='', blank=False):
+	def topo_sort(self, sink=None, blank=False, detached=False):
 		""" Topological sort: return a topologically sorted list of vertices.
 
-		:param file_prefix: if provided, the procedure generates .dot diagrams for each step; dot filenames concatenate this prefix with a number suffix.
-		:type file_prefix: str
+		:param sink: if provided, the procedure generates .dot diagrams for each step: a SnapshotSink, or a file prefix (dot filenames concatenate this prefix with a number suffix).
+		:type sink: SnapshotSink or str
 		:param blank: if True, the procedure generates only .dot templates for each step; the colors and attributes of the node are not shown.
 		:param blank: bool
+		:param detached: if True, the vertex attributes are left untouched (no reset either): the search runs on the array-backed view of the graph (:meth:`frozen_view`). Detached searches can share the graph, and run concurrently; they do not generate snapshots.
+		:type detached: bool
 		:return: a topologically sorted list of Vertex objects
 		:rtype: list
 		"""	
+		if detached:
+			vertices = list( self.V.values() )
+			return [ vertices[i] for i in self._detached( sink ).topo_sort() ]
 		#log("Starting topological sort...")
 
-		time = 0
-
 		def topo_string(lst):
 			"""
 			Display the content of the topologically sorted list
@@ -345,62 +567,49 @@ class Graph():
 				return 'S='
 			return 'Sorted list S=[{}]'.format(', '.join([ v.label for v in lst ]))
 
-		def depth_first_topo(u, spacer=''): 
-			""" Recursive procedure, for depth-first search.
-
-			:param u: the vertex under examination
-			:type u: Vertex
-			:type topo: list
-			"""
-			nonlocal time
-			time += 1	
-			log(spacer+'depth_first_visit({}) at time {}:00'.format( u.label, time ),3)
-			u.discovery = time
-			u.color = Vertex.GRAY
-
-			if file_prefix != '':
-				self.to_dot_file( '{}{:02}'.format(file_prefix,time), Walk.DFS, legend=topo_string(topo),  blank=blank )
-
-			for v in sorted( self.Adj[ u ], key=lambda x: x.label):
-				if v.color == Vertex.WHITE:
-					v.pi = u
-					depth_first_topo( v, spacer+'\t' )
-			u.color = Vertex.BLACK
-			time += 1
-			u.finish = time
-			
-			topo.insert(0, u)
+		def snapshot(u, time):
+			recorder.touch( u )
+			recorder.frame( time, topo_string(reversed(topo)) )
 
+		def finished(u):
+			topo.append(u)
+			snapshot(u, u.finish)
 
-			if file_prefix != '':
-				self.to_dot_file( '{}{:02}'.format(file_prefix,time), Walk.DFS, legend=topo_string(topo), blank=blank )
-
-			log(spacer+'finish {} at time {}:00'.format( u.label, time ),3)
-
+		# vertices in order of increasing finishing time: the list is reversed at the end
 		topo=[]
 
-		for v in self.V.values():
-			if v.color == Vertex.WHITE:
-				depth_first_topo( v, '' )
+		if sink:
+			recorder = FrameRecorder( self, Walk.DFS, blank )
+			time = self.depth_first_search( lambda u: snapshot(u, u.discovery), finished )
+		else:
+			time = self.depth_first_search( finished=topo.append )
+		topo.reverse()
 		
-		if not blank and file_prefix != '':
-			self.to_dot_file( '{}{:02}'.format(file_prefix,time), Walk.DFS, legend=topo_string(topo), blank=blank)
-
-			self.get_tree().to_dot_file( '{}{:02}'.format(file_prefix,time+1), Walk.DFS, blank=blank)
+		if sink:
+			if not blank:
+				recorder.frame( time, topo_string(topo) )
+				recorder.add( time+1, self.get_tree().to_dot( Walk.DFS ))
+			recorder.write( sink )
 
 		return topo
 
 
-	def dag_shortest_path(self, source, file_prefix='', blank=False):
+	def dag_shortest_path(self, source, sink=None, blank=False, detached=False):
 		""" DAG Shortest path algorithm.
 
 		:param source: source vertex
 		:type source: str
-		:param file_prefix: if provided, the procedure generates .dot diagrams for each step; dot filenames concatenate this prefix with a number suffix.
-		:type file_prefix: str
+		:param sink: if provided, the procedure generates .dot diagrams for each step: a SnapshotSink, or a file prefix (dot filenames concatenate this prefix with a number suffix).
+		:type sink: SnapshotSink or str
 		:param blank: if True, the procedure generates only .dot templates for each step; the colors and attributes of the node are not shown.
 		:param blank: bool
+		:param detached: if True, the vertex attributes are left untouched (no reset either): the search runs on the array-backed view of the graph (:meth:`frozen_view`), and its results are returned in a SearchState, indexed by vertex id. Detached searches can share the graph, and run concurrently; they do not generate snapshots.
+		:type detached: bool
+		:return: in detached mode, the results of the search
+		:rtype: SearchState
 		"""
+		if detached:
+			return self._detached( sink ).dag_shortest_path( source )
 		log("Starting DAG shortest path...",3)
 
 		def topo_string(lst):
@@ -418,25 +627,170 @@ class Graph():
 		self.initialize_single_source(s)
 
 		file_number=0
-		if file_prefix != '':
-			file_number+=self.to_dot_file( '{}{:02}'.format(file_prefix,file_number), Walk.DAGSP, legend=topo_string( sorted_vertices), blank=blank)
+		recorder = None
+		if sink:
+			recorder = FrameRecorder( self, Walk.DAGSP, blank )
+			recorder.frame( file_number, topo_string( sorted_vertices ))
+			file_number += 1
 
-		while len(sorted_vertices)>0:
+		# walk the sorted list with an index: the vertices still to be processed are sorted_vertices[i+1:]
+		for i, u in enumerate(sorted_vertices):
 
-			u = sorted_vertices.pop(0)
-			log("-- u={} -- ".format(u.label),3)
+			if log_level >= 3:
+				log("-- u={} -- ".format(u.label),3)
 
 			for v in self.Adj[ u ]:
 				self.relax(u, v)
 			u.color=Vertex.BLACK
 
-			if file_prefix != '':
-				file_number += self.to_dot_file( '{}{:02}'.format(file_prefix,file_number), Walk.DAGSP, legend=topo_string( sorted_vertices), blank=blank)
+			if recorder is not None:
+				recorder.touch( u, *self.Adj[ u ] )
+				recorder.frame( file_number, topo_string( sorted_vertices[i+1:] ))
+				file_number += 1
 				
 
-		if file_prefix!='' and not blank:
-			self.get_tree().to_dot_file( '{}{:02}'.format(file_prefix,file_number), Walk.DAGSP) 
+		if recorder is not None:
+			if not blank:
+				recorder.add( file_number, self.get_tree().to_dot( Walk.DAGSP ))
+			recorder.write( sink )
+
+
+	def bellman_ford(self, source, sink=None, blank=False, queue=False, detached=False):
+		""" Bellman-Ford shortest path algorithm: unlike Dijkstra's algorithm, it handles negative edge weights.
+
+		By default, all edges are relaxed at each pass, and the procedure stops after the first pass that does not change any distance (at most |V|-1 passes). With `queue=True` (the SPFA variant), only the edges out of the vertices whose distance has changed are relaxed: the vertex queue is processed in FIFO order, and a vertex is GRAY while it is in the queue.
+
+		:param source: source vertex
+		:type source: str
+		:param sink: if provided, the procedure generates .dot diagrams for each step (pass or queue extraction): a SnapshotSink, or a file prefix (dot filenames concatenate this prefix with a number suffix).
+		:type sink: SnapshotSink or str
+		:param blank: if True, the procedure generates only .dot templates for each step; the colors and attributes of the node are not shown.
+		:param blank: bool
+		:param queue: if True, use the queue-driven variant.
+		:type queue: bool
+		:param detached: if True, the vertex attributes are left untouched (no reset either): the search runs on the array-backed view of the graph (:meth:`frozen_view`), and its results are returned in a SearchState, indexed by vertex id (the `queue` variant is not available: ValueError). Detached searches can share the graph, and run concurrently; they do not generate snapshots.
+		:type detached: bool
+		:return: in detached mode, the results of the search
+		:rtype: SearchState
+		:raises NegativeCycleException: if a negative-weight cycle is reachable from the source
+		"""
+		if detached:
+			if queue:
+				raise ValueError('The queue variant is not supported in detached mode')
+			return self._detached( sink ).bellman_ford( source )
+		log("Starting Bellman-Ford...",3)
+
+		def queue_string(q):
+			if blank:
+				return 'Q='
+			return 'Q={}'.format(', '.join([ vtx.label for vtx in q ]))
+
+		def pass_string(p):
+			if blank:
+				return 'Pass '
+			return 'Pass {}'.format(p)
+
+		s = self.V[source]
+		self.initialize_single_source(s)
+		n = len(self.V)
 
+		def negative_cycle(cycle):
+			# the frames recorded so far are written anyway
+			if recorder is not None:
+				recorder.write( sink )
+			return NegativeCycleException( cycle )
+
+		file_number=0
+		recorder = None
+		if sink:
+			recorder = FrameRecorder( self, Walk.DIJKSTRA, blank )
+		if not queue:
+			if recorder is not None:
+				recorder.frame( file_number, pass_string(0) )
+				file_number += 1
+
+			for p in range(1, n+1):
+				changed = None
+				for u in self.V.values():
+					if u.distance == Vertex.INFTY:
+						continue
+					for v in self.Adj[ u ]:
+						d = v.distance
+						self.relax(u, v)
+						if v.distance < d:
+							changed = v
+							if recorder is not None:
+								recorder.touch( v )
+				if changed is None:
+					break
+				if p == n:
+					# a distance still changes after |V|-1 passes
+					raise negative_cycle( self.parent_cycle() )
+
+				if recorder is not None:
+					recorder.frame( file_number, pass_string(p) )
+					file_number += 1
+		else:
+			# number of edges on the path that gave its current distance to each vertex (indexed by vertex id)
+			path_length = [ 0 ] * n
+			q = clt.deque([ s ])
+			s.color = Vertex.GRAY
+			if recorder is not None:
+				recorder.frame( file_number, queue_string(q) )
+				file_number += 1
+
+			while q:
+				u = q.popleft()
+				u.color = Vertex.BLACK
+				if log_level >= 3:
+					log("Extract vertex {} (d={})".format(u.label, u.distance),3)
+				for v in self.Adj[ u ]:
+					d = v.distance
+					self.relax(u, v)
+					if v.distance < d:
+						path_length[v.id] = path_length[u.id] + 1
+						# a shortest path has at most |V|-1 edges: the longer ones go through a negative cycle
+						if path_length[v.id] >= n:
+							cycle = self.parent_cycle()
+							if cycle is not None:
+								raise negative_cycle( cycle )
+						if v.color != Vertex.GRAY:
+							v.color = Vertex.GRAY
+							q.append( v )
+
+				if recorder is not None:
+					recorder.touch( u, *self.Adj[ u ] )
+					recorder.frame( file_number, queue_string(q) )
+					file_number += 1
+
+		if recorder is not None:
+			if not blank:
+				recorder.add( file_number, self.get_tree().to_dot( Walk.DIJKSTRA ))
+			recorder.write( sink )
+
+	def parent_cycle(self):
+		""" Find a cycle in the predecessor subgraph (the `pi` pointers): after a shortest path procedure, such a cycle has a negative weight.
+
+		:return: the labels of the vertices on the cycle, in path order, or None if there is no cycle.
+		:rtype: list
+		"""
+		# number of the walk that first visited each vertex (indexed by vertex id)
+		walk = [ -1 ] * len(self.V)
+		for w, v in enumerate( self.V.values() ):
+			u = v
+			while u is not None and walk[u.id] == -1:
+				walk[u.id] = w
+				u = u.pi
+			if u is not None and walk[u.id] == w:
+				# back to a vertex of the current walk
+				cycle = [ u.label ]
+				x = u.pi
+				while x is not u:
+					cycle.append( x.label )
+					x = x.pi
+				cycle.reverse()
+				return cycle
+		return None
 
 	def initialize_single_source(self, s):
 		""" Initialize the graph.
@@ -450,16 +804,29 @@ class Graph():
 			v.pi = None
 		s.distance = 0
 
-	def dijkstra(self, s, file_prefix='', blank=False):
+	def dijkstra(self, s, sink=None, blank=False, arity=None, target=None, detached=False):
 		""" Dijkstra's shortest path algorithm.
 
 		:param s: source vertex (a label)
 		:type s: str
-		:param file_prefix: if provided, the procedure generates .dot diagrams for each step; dot filenames concatenate this prefix with a number suffix.
-		:type file_prefix: str
+		:param sink: if provided, the procedure generates .dot diagrams for each step: a SnapshotSink, or a file prefix (dot filenames concatenate this prefix with a number suffix).
+		:type sink: SnapshotSink or str
 		:param blank: if True, the procedure generates only .dot templates for each step; the colors and attributes of the node are not shown.
 		:param blank: bool
+		:param arity: if provided (typically 2, 4, or 8), the priority queue is an IndexedMinHeap with this arity, instead of a MinHeap.
+		:type arity: int
+		:param target: if provided (a label), the search stops as soon as the shortest path to this vertex is known. The queue then starts with the source vertex only, and vertices are pushed into a LazyMinHeap as they are reached (`arity` is ignored). Vertices that have not been extracted (i.e. not BLACK) only carry tentative distances.
+		:type target: str
+		:param detached: if True, the vertex attributes are left untouched (no reset either): the search runs on the array-backed view of the graph (:meth:`frozen_view`), and its results are returned in a SearchState, indexed by vertex id (`arity` and `target` are not available: ValueError). Detached searches can share the graph, and run concurrently; they do not generate snapshots.
+		:type detached: bool
+		:return: the distance of the target vertex, if a target is provided; in detached mode, the results of the search (a SearchState); None otherwise.
 		"""
+		if detached:
+			if target is not None:
+				raise ValueError('A target is not supported in detached mode')
+			if arity is not None:
+				raise ValueError('A heap arity is not supported in detached mode')
+			return self._detached( sink ).dijkstra( s )
 
 		def queue_string(q):
 			if blank:
@@ -470,33 +837,193 @@ class Graph():
 		self.initialize_single_source( self.V[s] )
 		S = []
 
-		minQueue = MinHeap( self.V.values() )
+		handles = None
+		t = self.V[target] if target is not None else None
+		if t is not None:
+			minQueue = LazyMinHeap()
+			minQueue.push( self.V[s], (0, s) )
+		elif arity is None:
+			minQueue = MinHeap( self.V.values() )
+		else:
+			# keys are (distance, label) pairs: same order as Vertex.__gt__()
+			minQueue = IndexedMinHeap( arity )
+			# queue handles, indexed by vertex id
+			handles = [ None ] * len(self.V)
+			for v in self.V.values():
+				handles[v.id] = minQueue.push( v, (v.distance, v.label) )
 
 		file_number=0
 
-		if file_prefix!='':
-				file_number += self.to_dot_file( '{}{}'.format(file_prefix, file_number),#
-								legend=queue_string(minQueue),
-								blank=blank)
-		while minQueue.size > 0:
+		recorder = None
+		if sink:
+			recorder = FrameRecorder( self, Walk.BFS, blank )
+			recorder.frame( file_number, queue_string(minQueue) )
+			file_number += 1
+		while not minQueue.is_empty():
 			u = minQueue.extract_min()
 			u.color=Vertex.BLACK
-			log("Extract vertex {} (d={})".format(u.label, u.distance),3)
+			if log_level >= 3:
+				log("Extract vertex {} (d={})".format(u.label, u.distance),3)
 			S.append( u )
-			for v in self.Adj[ u ]:
-				self.relax( u, v )
-
-			if file_prefix!='':
-				file_number += self.to_dot_file( '{}{:02}'.format(file_prefix,file_number),#
-								legend=queue_string(minQueue),
-								blank=blank)
+			if t is not None:
+				for v in self.Adj[ u ]:
+					d = v.distance
+					self.relax( u, v )
+					if v.distance < d and v.color != Vertex.BLACK:
+						minQueue.push( v, (v.distance, v.label) )
+			elif handles is None:
+				for v in self.Adj[ u ]:
+					d = v.distance
+					self.relax( u, v )
+					if v.distance < d and v in minQueue:
+						minQueue.float_item( v )
+			else:
+				for v in self.Adj[ u ]:
+					d = v.distance
+					self.relax( u, v )
+					if v.distance < d and handles[v.id] in minQueue:
+						minQueue.decrease_key( handles[v.id], (v.distance, v.label) )
+
+			if recorder is not None:
+				recorder.touch( u, *self.Adj[ u ] )
+				recorder.frame( file_number, queue_string(minQueue) )
+				file_number += 1
+
+			if u is t:
+				break
 		
 	
-		if not blank and file_prefix != '':
-			self.get_tree().to_dot_file( '{}{:02}'.format(file_prefix,file_number), Walk.DIJKSTRA, blank=blank)
+		if recorder is not None:
+			if not blank:
+				recorder.add( file_number, self.get_tree().to_dot( Walk.DIJKSTRA ))
+			recorder.write( sink )
+
+		if t is not None:
+			return t.distance
 			
 
 
+	def bidirectional_dijkstra(self, s, t):
+		""" Point-to-point shortest path: Dijkstra's algorithm, run simultaneously forward from the source and backward from the target (over the reverse adjacency lists).
+
+		The forward search uses the vertex attributes, as :meth:`dijkstra` does; the backward search keeps its distances in a separate dictionary. At each step, the search with the smaller queue is expanded, until the sum of the smallest keys in both queues exceeds the length of the best path found so far. The backward part of this path is then copied into the vertex attributes, so that the `pi` pointers lead from the target back to the source, and the vertices on the path carry their distances from the source.
+
+		:param s: source vertex (a label)
+		:type s: str
+		:param t: target vertex (a label)
+		:type t: str
+		:return: the distance from s to t (Vertex.INFTY if t is not reachable)
+		"""
+		source, target = self.V[s], self.V[t]
+		self.initialize_single_source( source )
+		reverse = self.reverse_adjacency()
+
+		# backward search: distance to the target, and next vertex on the path to the target
+		backward = { target: 0 }
+		successor = { target: None }
+		backward_done = set()
+
+		forward_queue = LazyMinHeap()
+		forward_queue.push( source, (0, source.label) )
+		backward_queue = LazyMinHeap()
+		backward_queue.push( target, (0, target.label) )
+
+		# best path so far: its length, and the edge (x,y) where both searches meet
+		best = Vertex.INFTY
+		meet = None
+		if source is target:
+			best = 0
+
+		while not forward_queue.is_empty() and not backward_queue.is_empty():
+			if forward_queue.min_key()[0] + backward_queue.min_key()[0] >= best:
+				break
+
+			if len(forward_queue) <= len(backward_queue):
+				u = forward_queue.extract_min()
+				u.color = Vertex.BLACK
+				for v in self.Adj[ u ]:
+					d = v.distance
+					self.relax( u, v )
+					if v.distance < d and v.color != Vertex.BLACK:
+						forward_queue.push( v, (v.distance, v.label) )
+					if v in backward and u.distance + self.Matrix[u][v] + backward[v] < best:
+						best = u.distance + self.Matrix[u][v] + backward[v]
+						meet = (u, v)
+			else:
+				u = backward_queue.extract_min()
+				backward_done.add( u )
+				du = backward[u]
+				for v in reverse[ u ]:
+					d = du + self.Matrix[v][u]
+					if v not in backward_done and d < backward.get( v, Vertex.INFTY ):
+						backward[v] = d
+						successor[v] = u
+						backward_queue.push( v, (d, v.label) )
+					if v.distance + d < best:
+						best = v.distance + d
+						meet = (v, u)
+
+		if meet is not None:
+			# extend the forward tree along the backward path
+			x, y = meet
+			while y is not None:
+				if x.distance + self.Matrix[x][y] < y.distance:
+					y.distance = x.distance + self.Matrix[x][y]
+					y.pi = x
+				x, y = y, successor[y]
+		return target.distance
+
+
+	def a_star(self, source, target, heuristic='euclidean', arity=4):
+		""" A* search: a point-to-point Dijkstra search, where the queue key of a vertex v is its distance plus a lower bound h(v) of its distance to the target.
+
+		The built-in heuristics compute distances between vertex coordinates (see :meth:`load_coordinates`): they are admissible as long as the weight of an edge is not less than the distance between its end points in the plane. A vertex whose distance improves after it has been extracted (inconsistent heuristic) is pushed back into the queue.
+
+		:param source: source vertex (a label)
+		:type source: str
+		:param target: target vertex (a label)
+		:type target: str
+		:param heuristic: 'euclidean' (the default), 'manhattan', or a function h(v, target) of two vertices.
+		:param arity: arity of the IndexedMinHeap priority queue
+		:type arity: int
+		:return: a pair (distance of the target, number of vertices extracted from the queue)
+		:rtype: tuple
+		"""
+		if not callable( heuristic ):
+			if heuristic not in heuristics:
+				raise ValueError('Unknown heuristic: {} (expected one of {})'.format(heuristic, ', '.join(sorted(heuristics))))
+			heuristic = heuristics[ heuristic ]
+
+		s, t = self.V[source], self.V[target]
+		self.initialize_single_source( s )
+
+		# heuristic values, computed once per vertex
+		h = { s: heuristic( s, t ) }
+		queue = IndexedMinHeap( arity )
+		handles = { s: queue.push( s, (h[s], s.label) ) }
+		settled = 0
+
+		while not queue.is_empty():
+			u = queue.extract_min()
+			u.color = Vertex.BLACK
+			settled += 1
+			if u is t:
+				break
+			for v in self.Adj[ u ]:
+				d = v.distance
+				self.relax( u, v )
+				if v.distance < d:
+					if v not in h:
+						h[v] = heuristic( v, t )
+					key = (v.distance + h[v], v.label)
+					if v in handles and handles[v] in queue:
+						queue.decrease_key( handles[v], key )
+					else:
+						v.color = Vertex.WHITE
+						handles[v] = queue.push( v, key )
+		return (t.distance, settled)
+
+
 	def relax(self, u, v ):
 		"""
 		Relax vertex v through u
@@ -506,32 +1033,46 @@ class Graph():
 		:type u: Vertex
 		:type v: Vertex
 		"""
-		if v.distance > (u.distance + self.Matrix[u][v] ):
-			log('relax({},{}): {} --> {}'.format(u.label, v.label, v.distance, (u.distance + self.Matrix[u][v])),3)
-			v.distance = (u.distance + self.Matrix[u][v] )
-
-			if hasattr(v,'heap') and v.heap is not None:
-				v.float_key( v.heap_index )
+		d = u.distance + self.Matrix[u][v]
+		if v.distance > d:
+			if log_level >= 3:
+				log('relax({},{}): {} --> {}'.format(u.label, v.label, v.distance, d),3)
+			v.distance = d
 			v.pi = u
 
 
-	def unique_edges(self):
+	def weight(self, u, v):
 		"""
+		Weight of the edge (u,v).
+
+		:param u: vertex u
+		:param v: vertex v
+		:type u: Vertex
+		:type v: Vertex
+		:return: the edge weight (1 for an unweighted edge), or None if there is no such edge
+		"""
+		return self.Matrix[u].get(v)
+
+	def unique_edges(self):
 		"""
+		Enumerate the edges of the graph, in vertex order: an undirected edge is listed once, as (u,v) where u is the endpoint with the smallest id, unless u does not list it anymore (ex. after to_tree(), only the parent keeps a tree edge).
 
-		checked_matrix = { v1: { v2: False for v2 in self.V.values() } for v1 in self.V.values() }
-		edges = []
+		The successors of a vertex are read from its row of the sparse matrix, which has no duplicates, so that no bookkeeping structure is needed.
 
+		:return: a generator of (u,v) pairs of vertices
+		"""
+		if self.directed:
+			for u in self.V.values():
+				for v in self.Adj[u]:
+					yield (u, v)
+			return
+
+		matrix = self.Matrix
 		for u in self.V.values():
-			for v in self.Adj[u]:
-				if not self.directed:
-					if not checked_matrix[u][v] and not checked_matrix[v][u]:
-						checked_matrix[u][v]=True
-						checked_matrix[v][u]=True
-						edges.append( (u,v) )
-				else:
-					edges.append( (u,v) )
-		return edges
+			uid = u.id
+			for v in matrix[u]:
+				if v.id >= uid or u not in matrix[v]:
+					yield (u, v)
 
 
 	def to_dot_file(self, filename, walk=Walk.BFS, legend='', blank=False):
@@ -572,17 +1113,8 @@ class Graph():
 		for v in self.V.values():
 			gs.append( v.to_dot(walk, blank) )	
 
-		for edge in self.unique_edges():
-			u,v = edge
-			penwidth=1 
-			if self.directed:
-				if not blank and v.pi is u:
-					penwidth=3
-				gs.append( '{}->{}[label="{}", penwidth={}];'.format(u.label, v.label, self.Matrix[u][v] if self.weighted else '', penwidth))
-			else:
-				if not blank and u.pi is v or v.pi is u:
-					penwidth=3
-				gs.append( '{}--{}[label="{}", penwidth={}];'.format(u.label, v.label, self.Matrix[u][v] if self.weighted else '', penwidth))
+		for u, v in self.unique_edges():
+			gs.append( self.edge_to_dot(u, v, blank) )
 		if legend != '':
 			gs.append( 'label="{}" fontname="DejaVu Serif"'.format( legend ))
 		
@@ -591,6 +1123,27 @@ class Graph():
 		return('\n'.join(gs))
 
 
+	def edge_to_dot(self, u, v, blank=False):
+		"""
+		Return the DOT statement of an edge; edges of the predecessor subgraph are drawn with a thicker line.
+
+		:param u: the tail vertex
+		:type u: Vertex
+		:param v: the head vertex
+		:type v: Vertex
+		:return: an edge statement, in DOT format
+		:rtype: str
+		"""
+		penwidth=1 
+		if self.directed:
+			if not blank and v.pi is u:
+				penwidth=3
+			return '{}->{}[label="{}", penwidth={}];'.format(u.label, v.label, self.Matrix[u][v] if self.weighted else '', penwidth)
+		if not blank and u.pi is v or v.pi is u:
+			penwidth=3
+		return '{}--{}[label="{}", penwidth={}];'.format(u.label, v.label, self.Matrix[u][v] if self.weighted else '', penwidth)
+
+
 	def to_tree(self):
 		"""After DFS or BFS, remove the edges that are not in the resulting subgraph.
 
@@ -605,7 +1158,10 @@ class Graph():
 		for edge in edges_to_remove:
 			u,v=edge
 			self.Adj[u].remove(v)
-			self.Matrix[u][v]=None
+			self.Matrix[u].pop(v, None)
+		self.sorted_adj = None
+		self.reverse_adj = None
+		self.frozen = None
 		for v in self.V.values():
 			v.color = Vertex.WHITE
 
@@ -616,16 +1172,47 @@ class Graph():
 		return g
 
 	@classmethod
-	def from_dot_to_lists(cls, dotfile):
+	def from_dot_to_lists(cls, dotfile, lazy=False):
 		"""
 		Load a graph from a dot file, and construct lists of vertices and edges.
 
+		This is the parsing stage of :meth:`from_dot`: the lists can be filtered before building a graph (ex. `Graph( vertices, edges, directed )`). An edge with a numerical label has a weight.
+
+		With `lazy=True`, the edges are generated as they are read, instead of being stored in a list: the file stays open until the generator is exhausted (or closed), and the vertex list grows as the file is read (it is complete once the generator is exhausted).
+
 		:param dotfile: the name of a graph-definition file, in DOT format.
 		:type dotfile: str
-		:return: a pair: the first element is a list of vertex labels, the second is a list of edges (pairs of labels)
+		:param lazy: if True, return a generator of edges instead of a list.
+		:type lazy: bool
+		:return: a triple: the first element is a list of vertex labels (in order of appearance), the second is a list of edges (pairs of labels, or triples (label, label, weight)), the third is True for a directed graph.
 		:rtype: tuple
+		:raises DotSyntaxError: if the file is not a valid DOT graph
 		"""
-		pass
+		def edges():
+			# the file is owned by the generator: it is closed when the generator is exhausted, closed, or collected
+			with open(dotfile, 'r') as gf:
+				reader = DotReader( gf )
+				# first item: the reader, once the graph header has been read
+				yield reader
+				# weights, by label (most edges share a few labels)
+				weights = {}
+				for (u, v, attributes) in reader.edges():
+					label = attributes.get('label')
+					if label is None:
+						yield (u, v)
+						continue
+					weight = weights.get( label )
+					if weight is None:
+						if len(weights) >= 1024:
+							weights.clear()
+						weight = weights[label] = parse_weight( label ) if weight_re.fullmatch( label ) else ''
+					yield (u, v, weight) if weight != '' else (u, v)
+
+		e = edges()
+		reader = next( e )
+		if lazy:
+			return (reader.vertices, e, reader.directed)
+		return (reader.vertices, list( e ), reader.directed)
 		
 
 	@classmethod
@@ -633,55 +1220,23 @@ class Graph():
 		"""
 		Load a graph from a dot file.
 
+		The file is parsed as a stream (see :meth:`from_dot_to_lists`): vertices and edges are added to the graph as they are read.
+
 		:param dotfile: the name of a graph-definition file, in DOT format.
 		:type dotfile: str
 		:return: a Graph object;  an edge numerical label in the dot file is interpreted as an edge weight.
 		:rtype: Graph
+		:raises DotSyntaxError: if the file is not a valid DOT graph
 		"""
-		gf = open(dotfile, 'r')
-		
-		directed=False
-
-		v=[]
-		e=[]
-		
-		# 'Digraph {' or 'Graph {'
-		graph_re = re.compile(r'(Digraph|Graph)\s*{')
-
-		# 'u [ label="u:3" style=filled fontname="time-bold" fillcolor=gray52 ];'
-		vertex_re = re.compile(r"^\s*(\w+)\s*\[.*\]\s*;")
-
-
-		# 'w--s[label="", penwidth=3];' or 'w--s[label="7", penwidth=3];
-		edge_re = re.compile(r'^\s*(\w+)\s*-[->]\s*(\w+)\s*(\[.*\])?\s*;')
-
-		label_re = re.compile(r'.*label="(-?\d+)".*')
-
-		for line in gf:
-			v_match = vertex_re.match( line )
-			e_match = edge_re.match( line )
-			g_match = graph_re.match( line )
-			if g_match and g_match.group(1)=='Digraph':
-				directed=True
-			if v_match:
-				v.append( v_match.group(1) )
-			elif e_match:
-				#print(e_match, e_match.lastindex)
-				v1,v2  = e_match.group(1), e_match.group(2)
-				if not directed and v1 > v2:
-						v2,v1 = v1,v2
-				weight=None
-				if e_match.lastindex==3:
-						label_match = label_re.match( e_match.group(3) )
-						if label_match:
-							#print("Found weight")
-							e.append( ( v1, v2, int(label_match.group(1))))
-						else: e.append( (v1,v2) )
-				else:
-					e.append( (v1, v2))
-		gf.close()			
-
-		return cls(v, e, directed)
+		vertices, edges, directed = cls.from_dot_to_lists( dotfile, lazy=True )
+		g = cls( directed=directed )
+		for edge in edges:
+			g.add_edge( *edge )
+		# isolated vertices
+		for label in vertices:
+			g.add_vertex( label )
+		g.sort_vertices()
+		return g
 		
 
 	def copy(self):
@@ -706,14 +1261,111 @@ class Graph():
 			g_u = g.V[u.label]
 			g.Adj[g_u] = [ g.V[v.label] for v in self.Adj[u] ]
 
-		g.Matrix = { v1: { v2: None for v2 in g.V.values() } for v1 in g.V.values() } 
-		for u in self.Matrix.keys():
-			for v in self.Matrix[u]:
-				g_u = g.V[u.label]
-				g_v = g.V[v.label]
-				g.Matrix[g_u][g_v]=self.Matrix[u][v]
+		g.Matrix = { g.V[u.label]: { g.V[v.label]: w for v, w in row.items() } for u, row in self.Matrix.items() }
 		log(g,3)
 		return g	
+
+	def freeze(self):
+		"""
+		Return an immutable, array-backed (CSR) view of this graph.
+
+		The vertex and edge sets are those of the graph at the time of the call: later changes to the graph are not reflected in the view.
+
+		:return: a compressed sparse row representation of the graph, with integer vertex ids.
+		:rtype: FrozenGraph
+		"""
+		return FrozenGraph.from_graph( self )
+
+	def frozen_view(self):
+		"""
+		Return an immutable, array-backed view of this graph (see :meth:`freeze`), cached until the graph changes: this is the graph that the traversals run on in detached mode.
+
+		As for :meth:`sorted_adjacency`, methods that modify the graph must reset the cache (`self.frozen = None`); so must the callers that change the weights in `Matrix` directly.
+
+		:rtype: FrozenGraph
+		"""
+		frozen = self.frozen
+		if frozen is None:
+			frozen = self.frozen = self.freeze()
+		return frozen
+
+	def _detached(self, sink):
+		""" The graph for a detached traversal: snapshots are drawn from the vertex attributes, that a detached traversal does not set. """
+		if sink:
+			raise ValueError('Snapshots are not available in detached mode')
+		return self.frozen_view()
+
+	def all_pairs_shortest_paths(self, method=None):
+		"""
+		Compute the distances between all pairs of vertices (see :meth:`FrozenGraph.all_pairs_shortest_paths`). Requires NumPy.
+
+		The rows and columns of the matrices follow the order of the vertex dictionary `V`.
+
+		:param method: 'floyd-warshall', 'johnson', or None (choose by density)
+		:type method: str
+		:return: the distance matrix and the predecessor matrix (vertex ids)
+		:rtype: tuple
+		:raises NegativeCycleException: if the graph has a negative-weight cycle
+		"""
+		return self.freeze().all_pairs_shortest_paths( method )
+
+	def save_binary(self, path):
+		"""
+		Save the graph in a binary format (see :meth:`FrozenGraph.save_binary`), that loads much faster than a DOT file.
+
+		Only the vertex labels, the edges and their weights are saved.
+
+		:param path: the file to be written
+		:type path: str
+		"""
+		self.freeze().save_binary( path )
+
+	@staticmethod
+	def load_binary(path, mmap=True):
+		"""
+		Load a graph saved by :meth:`save_binary`, as an immutable, array-backed graph (see :meth:`FrozenGraph.load_binary`): call its `thaw()` method for a Graph object.
+
+		:param path: a binary graph file
+		:type path: str
+		:param mmap: if True, map the file into memory, instead of reading it.
+		:type mmap: bool
+		:rtype: FrozenGraph
+		"""
+		return FrozenGraph.load_binary( path, mmap )
+
+	def shortest_paths_from(self, sources, workers=None, algorithm='dijkstra'):
+		"""
+		Compute the shortest paths from several sources, in parallel.
+
+		The runs do not use the vertex attributes: they all share a read-only snapshot of the graph (see :meth:`freeze`), which is sent once to each worker process.
+
+		:param sources: labels of the source vertices
+		:type sources: list
+		:param workers: number of worker processes; if None or 1, the runs are done in the current process.
+		:type workers: int
+		:param algorithm: the FrozenGraph method to run from each source: 'dijkstra' (the default), 'breadth_first', or 'dag_shortest_path'
+		:type algorithm: str
+		:return: a dictionary that maps every source label to the result of the corresponding run
+		:rtype: dict
+		"""
+		if algorithm not in ('dijkstra', 'breadth_first', 'dag_shortest_path'):
+			raise ValueError('Unknown algorithm: {}'.format(algorithm))
+		sources = list( sources )
+		frozen = self.freeze()
+		for label in sources:
+			frozen.vertex_id( label )
+
+		if workers is None or workers <= 1:
+			run = getattr( frozen, algorithm )
+			return { label: run( label ) for label in sources }
+
+		results = {}
+		with concurrent.futures.ProcessPoolExecutor( max_workers=workers, initializer=_init_worker, initargs=(frozen, algorithm) ) as pool:
+			chunksize = max(1, len(sources) // (4*workers))
+			for label, state in zip( sources, pool.map( _run_worker, sources, chunksize=chunksize )):
+				state.graph = frozen
+				results[label] = state
+		return results
 	
 
 	def load_coordinates(self, template):
@@ -764,6 +1416,754 @@ class Graph():
 			output += '\n'
 		return output
 
+
+class FrameRecorder():
+	""" Record the successive states of a graph while an algorithm runs, as a list of per-step deltas.
+
+	The DOT representation of the graph is rendered once, when the recorder is created. At each step, the algorithm marks the vertices whose attributes have changed (:meth:`touch`), then closes the step (:meth:`frame`): only the lines of these vertices, and of the edges to their old and new predecessors, are rendered again. Full frames are assembled on demand, by applying the deltas in order (:meth:`frames`, :meth:`write`): recording costs O(V+E) for the first frame, and about O(1) per vertex change.
+
+	:param graph: the graph to be recorded
+	:type graph: Graph
+	:param walk: the family of algorithms, that determines the information to be displayed with a node label
+	:type walk: Walk
+	:param blank: if True, only templates are recorded; the colors and attributes of the nodes are not shown.
+	:type blank: bool
+	"""
+
+	def __init__(self, graph, walk=Walk.BFS, blank=False):
+		self.graph = graph
+		self.walk = walk
+		self.blank = blank
+
+		self.lines = [ 'Digraph {' if graph.directed else 'Graph {' ]
+		# index of the line of each vertex; (index, tail, head) of the lines of the edges between two vertices
+		self.node_line = {}
+		self.edge_lines = {}
+		# predecessor of each vertex, as rendered
+		self.pi = {}
+		for v in graph.V.values():
+			self.node_line[v] = len(self.lines)
+			self.pi[v] = v.pi
+			self.lines.append( v.to_dot(walk, blank) )
+		for u, v in graph.unique_edges():
+			line = (len(self.lines), u, v)
+			self.edge_lines.setdefault( (u, v), [] ).append( line )
+			if not graph.directed and u is not v:
+				self.edge_lines.setdefault( (v, u), [] ).append( line )
+			self.lines.append( graph.edge_to_dot(u, v, blank) )
+
+		self.touched = set()
+		# one (number, legend, changes) triple per frame; changes is a list of (line index, line) pairs, or a full DOT string
+		self.deltas = []
+
+	def touch(self, *vertices):
+		""" Mark vertices whose attributes (color, distance, time stamps, predecessor) have changed during the current step.
+
+		:param vertices: Vertex objects
+		"""
+		self.touched.update( vertices )
+
+	def frame(self, number, legend=''):
+		""" Close the current step: record the changes of the vertices that have been touched since the last frame.
+
+		:param number: the frame number (a frame with the same number as a previous one replaces it when written)
+		:type number: int
+		:param legend: an optional string to be added to the graph
+		:type legend: str
+		"""
+		changes = []
+		edges = set()
+		for v in self.touched:
+			changes.append( (self.node_line[v], v.to_dot(self.walk, self.blank)) )
+			if v.pi is not self.pi[v]:
+				for p in (self.pi[v], v.pi):
+					if p is not None:
+						edges.add( (p, v) )
+				self.pi[v] = v.pi
+		graph = self.graph
+		for e in edges:
+			# an undirected edge keeps the orientation of its initial rendering
+			for i, u, v in self.edge_lines.get( e, () ):
+				changes.append( (i, graph.edge_to_dot(u, v, self.blank)) )
+		self.touched.clear()
+		self.deltas.append( (number, legend, changes) )
+
+	def add(self, number, dot):
+		""" Record a full frame, rendered by the caller (ex. the final search tree).
+
+		:param number: the frame number
+		:type number: int
+		:param dot: a graph, in DOT format
+		:type dot: str
+		"""
+		self.deltas.append( (number, '', dot) )
+
+	def __len__(self):
+		return len(self.deltas)
+
+	def frames(self):
+		""" Render the frames, in recording order.
+
+		:return: a generator of (frame number, DOT string) pairs
+		"""
+		lines = list( self.lines )
+		for number, legend, changes in self.deltas:
+			if isinstance( changes, str ):
+				yield (number, changes)
+				continue
+			for i, line in changes:
+				lines[i] = line
+			if legend != '':
+				yield (number, '\n'.join( lines + [ 'label="{}" fontname="DejaVu Serif"'.format( legend ), '}' ]))
+			else:
+				yield (number, '\n'.join( lines + [ '}' ]))
+
+	def write(self, sink):
+		""" Write the frames to a snapshot sink; a frame that is replaced by a later frame with the same number is skipped.
+
+		:param sink: a SnapshotSink, or a file prefix (dot filenames concatenate this prefix with the two-digit frame number)
+		:type sink: SnapshotSink or str
+		"""
+		sink, owned = make_sink( sink )
+		# position of the last frame with each number
+		last = { number: i for i, (number, legend, changes) in enumerate( self.deltas ) }
+		for i, (number, dot) in enumerate( self.frames() ):
+			if last[number] == i:
+				sink.add( number, dot )
+		if owned:
+			sink.close()
+		else:
+			sink.flush()
+
+
+# Worker-process state for Graph.shortest_paths_from(): the frozen graph is
+# received once, when the worker starts, and reused for every source.
+_worker_graph = None
+_worker_algorithm = None
+
+def _init_worker(frozen, algorithm):
+	global _worker_graph, _worker_algorithm
+	_worker_graph = frozen
+	_worker_algorithm = algorithm
+
+def _run_worker(source):
+	state = getattr( _worker_graph, _worker_algorithm )( source )
+	# the caller has its own copy of the graph: do not send it back
+	state.graph = None
+	return state
+
+
+def as_array(typecode, values):
+	""" Return the values as an array: a copy of a memory view, or the array itself.
+
+	:param typecode: the array type code
+	:type typecode: str
+	:param values: an array, or a memory view with the same format
+	:rtype: array
+	"""
+	if isinstance( values, array ):
+		return values
+	a = array( typecode )
+	a.frombytes( values.cast('B') )
+	return a
+
+
+class FrozenGraph():
+	""" An immutable graph, stored in compressed sparse row (CSR) format.
+
+	Vertices are identified by integers (their position in the original graph's vertex dictionary). The successors of vertex i are `targets[offsets[i]:offsets[i+1]]`, in label order, and the corresponding edge weights are stored at the same positions in `weights`.
+
+	Traversals do not touch any Vertex object: each of them returns its per-vertex results in a new SearchState object.
+	"""
+
+	__slots__ = ('labels', 'index', 'directed', 'weighted', 'offsets', 'targets', 'weights')
+
+	# binary file format (see save_binary())
+	BINARY_MAGIC = b'CSRGRAPH'
+	BINARY_VERSION = 1
+	binary_header = struct.Struct('<8sHHQQQ')
+	binary_typecodes = ('i', 'i', 'd')
+
+	# all_pairs_shortest_paths() runs Johnson's algorithm on graphs with fewer than JOHNSON_DENSITY * |V|^2 edges
+	JOHNSON_DENSITY = 1/50
+
+	def __init__(self, labels, offsets, targets, weights, directed=True, weighted=True):
+		"""
+		Create a frozen graph out of its CSR arrays (see :meth:`Graph.freeze` to build one from a graph).
+
+		:param labels: vertex labels, in vertex id order
+		:type labels: tuple
+		:param offsets: row offsets (|V|+1 integers)
+		:type offsets: array or memoryview
+		:param targets: edge targets (|E| vertex ids)
+		:type targets: array or memoryview
+		:param weights: edge weights (|E| floats)
+		:type weights: array or memoryview
+		"""
+		labels = tuple( labels )
+		setter = super().__setattr__
+		setter('labels', labels)
+		# label -> id dictionary, built on the first call to vertex_id()
+		setter('index', None)
+		setter('directed', directed)
+		setter('weighted', weighted)
+		setter('offsets', offsets)
+		setter('targets', targets)
+		setter('weights', weights)
+
+	@classmethod
+	def from_graph(cls, graph):
+		"""
+		Build the CSR arrays from a graph.
+
+		:param graph: the graph to be frozen
+		:type graph: Graph
+		:rtype: FrozenGraph
+		"""
+		labels = tuple( graph.V.keys() )
+		index = { label: i for i, label in enumerate(labels) }
+
+		offsets = array('i', [0])
+		targets = array('i')
+		weights = array('d')
+		adj = graph.sorted_adjacency()
+		for u in graph.V.values():
+			row = graph.Matrix[u]
+			for v in adj[u]:
+				targets.append( index[v.label] )
+				weights.append( row[v] )
+			offsets.append( len(targets) )
+
+		return cls( labels, offsets, targets, weights, graph.directed, graph.weighted )
+
+	def __setattr__(self, name, value):
+		raise AttributeError('FrozenGraph is immutable')
+
+	def __reduce__(self):
+		# pickling support (ex. for sending the graph to worker processes):
+		# the memory views of a mapped file are sent as arrays
+		return (self.__class__, (self.labels, as_array('i', self.offsets), as_array('i', self.targets), as_array('d', self.weights), self.directed, self.weighted))
+
+	def save_binary(self, path):
+		"""
+		Save the graph in a compact binary format, that :meth:`load_binary` maps back into memory without parsing.
+
+		Layout (little-endian), version 1:
+
+		- header: magic string `CSRGRAPH`, version (uint16), flags (uint16: 1=directed, 2=weighted), |V|, |E|, and the size of the label table, in bytes (uint64)
+		- label table: the vertex labels, in vertex id order, UTF-8 encoded and separated by NUL characters
+		- offsets (|V|+1 int32), targets (|E| int32), weights (|E| float64): each array starts on an 8-byte boundary
+
+		:param path: the file to be written
+		:type path: str
+		"""
+		if any( '\0' in label for label in self.labels ):
+			raise LabelException('A vertex label contains a NUL character: cannot be saved')
+		label_table = '\0'.join( self.labels ).encode('utf-8')
+		flags = (1 if self.directed else 0) | (2 if self.weighted else 0)
+		with open(path, 'wb') as out:
+			out.write( self.binary_header.pack( self.BINARY_MAGIC, self.BINARY_VERSION, flags, len(self.labels), len(self.targets), len(label_table) ))
+			out.write( label_table )
+			for (typecode, values) in zip( self.binary_typecodes, (self.offsets, self.targets, self.weights) ):
+				out.write( bytes( -out.tell() % 8 ))
+				values = as_array( typecode, values )
+				if sys.byteorder == 'big':
+					values = array( typecode, values )
+					values.byteswap()
+				values.tofile( out )
+
+	@classmethod
+	def load_binary(cls, path, mmap=True):
+		"""
+		Load a graph saved by :meth:`save_binary`.
+
+		The CSR arrays are not copied: they are read-only memory views over the file contents, that is either mapped into memory (the pages are then loaded by the OS as they are accessed), or read at once. Only the labels are decoded.
+
+		:param path: a binary graph file
+		:type path: str
+		:param mmap: if True, map the file into memory, instead of reading it.
+		:type mmap: bool
+		:rtype: FrozenGraph
+		:raises ValueError: if the file is not a binary graph file, or has an unsupported version
+		"""
+		with open(path, 'rb') as f:
+			if mmap:
+				buffer = mmap_module.mmap( f.fileno(), 0, access=mmap_module.ACCESS_READ )
+			else:
+				buffer = f.read()
+		view = memoryview( buffer )
+		if len(view) < cls.binary_header.size:
+			raise ValueError('Not a binary graph file: {}'.format(path))
+		magic, version, flags, n, m, label_size = cls.binary_header.unpack_from( view )
+		if magic != cls.BINARY_MAGIC:
+			raise ValueError('Not a binary graph file: {}'.format(path))
+		if version != cls.BINARY_VERSION:
+			raise ValueError('Unsupported binary graph version: {}'.format(version))
+
+		position = cls.binary_header.size
+		labels = str( view[position:position+label_size], 'utf-8' ).split('\0') if n else ()
+		position += label_size
+
+		arrays = []
+		for (typecode, count) in zip( cls.binary_typecodes, (n+1, m, m) ):
+			position += -position % 8
+			size = count * array(typecode).itemsize
+			if position + size > len(view):
+				raise ValueError('Truncated binary graph file: {}'.format(path))
+			values = view[position:position+size].cast( typecode )
+			if sys.byteorder == 'big':
+				values = array( typecode, values.tobytes() )
+				values.byteswap()
+			arrays.append( values )
+			position += size
+		return cls( labels, *arrays, directed=bool(flags & 1), weighted=bool(flags & 2) )
+
+	def thaw(self, graph_class=None):
+		"""
+		Build a (mutable) Graph out of this frozen graph, for the algorithms that work on Vertex objects.
+
+		The adjacency lists of the new graph are in label order; integral weights are converted back to integers.
+
+		:param graph_class: the class of the new graph (Graph, by default, or a subclass)
+		:type graph_class: type
+		:rtype: Graph
+		"""
+		labels, offsets, targets, weights = self.labels, self.offsets, self.targets, self.weights
+
+		def edges():
+			for u in range( len(labels) ):
+				loop = False
+				for k in range( offsets[u], offsets[u+1] ):
+					v = targets[k]
+					# an undirected edge is stored in both directions, and a self-loop twice in the list of its vertex
+					if not self.directed:
+						if v < u:
+							continue
+						if v == u:
+							loop = not loop
+							if not loop:
+								continue
+					if self.weighted:
+						w = weights[k]
+						yield (labels[u], labels[v], int(w) if w.is_integer() else w)
+					else:
+						yield (labels[u], labels[v])
+
+		return (graph_class or Graph)( labels, edges(), self.directed )
+
+	def __len__(self):
+		return len(self.labels)
+
+	def vertex_id(self, label):
+		"""
+		:param label: a vertex label
+		:type label: str
+		:return: the integer id of the vertex
+		:rtype: int
+		"""
+		index = self.index
+		if index is None:
+			index = dict( zip( self.labels, range( len(self.labels) )))
+			super().__setattr__('index', index)
+		if label not in index:
+			raise LabelException('No such vertex: {}'.format(label))
+		return index[label]
+
+	def successors(self, i):
+		"""
+		:param i: a vertex id
+		:type i: int
+		:return: the ids of the successors of vertex i, in label order
+		"""
+		return self.targets[ self.offsets[i]:self.offsets[i+1] ]
+
+	def breadth_first(self, source):
+		""" Breadth-First search.
+
+		:param source: label of the source vertex
+		:type source: str
+		:return: distances, parents and colors (BLACK for the reachable vertices)
+		:rtype: SearchState
+		"""
+		n = len(self.labels)
+		offsets, targets = self.offsets, self.targets
+		distance = [ Vertex.INFTY ] * n
+		pi = [ -1 ] * n
+
+		s = self.vertex_id( source )
+		distance[s] = 0
+		queue = clt.deque([ s ])
+		while queue:
+			u = queue.popleft()
+			du = distance[u] + 1
+			for k in range( offsets[u], offsets[u+1] ):
+				v = targets[k]
+				if distance[v] == Vertex.INFTY:
+					distance[v] = du
+					pi[v] = u
+					queue.append( v )
+		color = [ Vertex.BLACK if d != Vertex.INFTY else Vertex.WHITE for d in distance ]
+		return SearchState( self, distance, pi, color )
+
+	def depth_first(self):
+		""" Depth-First search, visiting the vertices in the same order as :meth:`Graph.depth_first`.
+
+		:return: parents, discovery and finish times
+		:rtype: SearchState
+		"""
+		return self._depth_first()[0]
+
+	def _depth_first(self):
+		"""
+		Depth-first search engine (explicit stack).
+
+		:return: a pair: the search state, and the list of vertex ids in order of increasing finish time.
+		:rtype: tuple
+		"""
+		n = len(self.labels)
+		offsets, targets = self.offsets, self.targets
+		discovery = [ 0 ] * n
+		finish = [ 0 ] * n
+		pi = [ -1 ] * n
+		order = []
+		time = 0
+		for root in range(n):
+			if discovery[root]:
+				continue
+			time += 1
+			discovery[root] = time
+			# stack of (vertex, position of the next edge to examine)
+			stack = [ (root, offsets[root]) ]
+			while stack:
+				u, k = stack[-1]
+				end = offsets[u+1]
+				while k < end and discovery[ targets[k] ]:
+					k += 1
+				if k < end:
+					v = targets[k]
+					stack[-1] = (u, k+1)
+					time += 1
+					discovery[v] = time
+					pi[v] = u
+					stack.append( (v, offsets[v]) )
+				else:
+					stack.pop()
+					time += 1
+					finish[u] = time
+					order.append( u )
+		return (SearchState( self, pi=pi, color=[ Vertex.BLACK ]*n, discovery=discovery, finish=finish ), order)
+
+	def topo_sort(self):
+		""" Topological sort (depth-first, visiting the vertices in the same order as :meth:`Graph.topo_sort`).
+
+		:return: a topologically sorted list of vertex ids
+		:rtype: list
+		"""
+		order = self._depth_first()[1]
+		order.reverse()
+		return order
+
+	def dag_shortest_path(self, source):
+		""" DAG Shortest path algorithm.
+
+		:param source: label of the source vertex
+		:type source: str
+		:return: distances, parents and colors
+		:rtype: SearchState
+		"""
+		n = len(self.labels)
+		offsets, targets, weights = self.offsets, self.targets, self.weights
+		distance = [ Vertex.INFTY ] * n
+		pi = [ -1 ] * n
+
+		distance[ self.vertex_id( source ) ] = 0
+		for u in self.topo_sort():
+			du = distance[u]
+			# same semantics as Graph.relax: an unreachable vertex has an infinite distance, that no edge can decrease
+			for k in range( offsets[u], offsets[u+1] ):
+				v = targets[k]
+				d = du + weights[k]
+				if distance[v] > d:
+					distance[v] = d
+					pi[v] = u
+		return SearchState( self, distance, pi, [ Vertex.BLACK ]*n )
+
+	def dijkstra(self, source):
+		""" Dijkstra's shortest path algorithm.
+
+		:param source: label of the source vertex
+		:type source: str
+		:return: distances, parents and colors (BLACK for the extracted vertices)
+		:rtype: SearchState
+		"""
+		n = len(self.labels)
+		weights = self.weights
+		distance = [ Vertex.INFTY ] * n
+		pi = [ -1 ] * n
+		color = [ Vertex.WHITE ] * n
+
+		self._dijkstra( self.vertex_id( source ), weights, distance, pi, color )
+		return SearchState( self, distance, pi, color )
+
+	def bellman_ford(self, source):
+		""" Bellman-Ford shortest path algorithm (negative edge weights are allowed): all edges are relaxed at each pass, until a pass does not change any distance.
+
+		:param source: label of the source vertex
+		:type source: str
+		:return: distances, parents and colors (BLACK for the reachable vertices)
+		:rtype: SearchState
+		:raises NegativeCycleException: if a negative-weight cycle is reachable from the source
+		"""
+		n = len(self.labels)
+		offsets, targets, weights = self.offsets, self.targets, self.weights
+		distance = [ Vertex.INFTY ] * n
+		pi = [ -1 ] * n
+
+		distance[ self.vertex_id( source ) ] = 0
+		for _ in range(n):
+			changed = -1
+			for u in range(n):
+				du = distance[u]
+				if du == Vertex.INFTY:
+					continue
+				for k in range( offsets[u], offsets[u+1] ):
+					v = targets[k]
+					d = du + weights[k]
+					if d < distance[v]:
+						distance[v] = d
+						pi[v] = u
+						changed = v
+			if changed == -1:
+				color = [ Vertex.BLACK if d != Vertex.INFTY else Vertex.WHITE for d in distance ]
+				return SearchState( self, distance, pi, color )
+		raise NegativeCycleException( [ self.labels[i] for i in self._parent_cycle( pi, changed ) ] )
+
+	def _dijkstra(self, s, weights, distance, pi, color):
+		""" Dijkstra's loop, over the given edge weights (the graph's own, or reweighted ones), filling the distance, parent and color lists in place.
+
+		:param s: id of the source vertex
+		:type s: int
+		"""
+		offsets, targets = self.offsets, self.targets
+		distance[s] = 0
+		# lazy deletion: stale queue entries are skipped when extracted
+		queue = [ (0, s) ]
+		while queue:
+			du, u = heapq.heappop( queue )
+			if color[u] == Vertex.BLACK:
+				continue
+			color[u] = Vertex.BLACK
+			for k in range( offsets[u], offsets[u+1] ):
+				v = targets[k]
+				d = du + weights[k]
+				if distance[v] > d:
+					distance[v] = d
+					pi[v] = u
+					heapq.heappush( queue, (d, v) )
+
+	def all_pairs_shortest_paths(self, method=None):
+		""" All-pairs shortest paths.
+
+		Two algorithms are available:
+
+		- 'floyd-warshall': O(V^3), but the inner loop over the matrix is done by NumPy, one row update per intermediate vertex
+		- 'johnson': Bellman-Ford reweighting (only if some weights are negative), then one Dijkstra run per source, in O(VE log V)
+
+		By default, Johnson's algorithm is chosen for sparse graphs (see `JOHNSON_DENSITY`), Floyd-Warshall otherwise.
+
+		The predecessor matrix of Floyd-Warshall is rebuilt from the final distances: on graphs with zero-weight cycles, a path read out of it may loop; use Johnson's algorithm on those.
+
+		:param method: 'floyd-warshall', 'johnson', or None (choose by density)
+		:type method: str
+		:return: a distance matrix `dist` (dist[i,j] is the distance from vertex i to vertex j, `numpy.inf` if j is not reachable), and a predecessor matrix `pred` (pred[i,j] is the parent of j on a shortest path from i, -1 for none), both indexed by vertex id
+		:rtype: tuple
+		:raises NegativeCycleException: if the graph has a negative-weight cycle
+		"""
+		if np is None:
+			raise ImportError('all_pairs_shortest_paths() requires NumPy')
+		n = len(self.labels)
+		if method is None:
+			method = 'johnson' if len(self.targets) < self.JOHNSON_DENSITY * n * n else 'floyd-warshall'
+		if method == 'floyd-warshall':
+			return self._floyd_warshall()
+		if method == 'johnson':
+			return self._johnson()
+		raise ValueError('Unknown all-pairs shortest paths method: {}'.format(method))
+
+	def _edge_arrays(self):
+		""" :return: the sources, targets and weights of all edges, as NumPy arrays """
+		n = len(self.labels)
+		offsets = np.frombuffer( self.offsets, dtype=np.intc )
+		sources = np.repeat( np.arange( n, dtype=np.intc ), np.diff( offsets ))
+		return ( sources, np.frombuffer( self.targets, dtype=np.intc ), np.frombuffer( self.weights, dtype=np.float64 ))
+
+	def _floyd_warshall(self):
+		n = len(self.labels)
+		sources, targets, weights = self._edge_arrays()
+
+		dist = np.full( (n, n), np.inf )
+		# parallel edges: keep the lightest one
+		np.minimum.at( dist, (sources, targets), weights )
+		np.fill_diagonal( dist, np.minimum( dist.diagonal(), 0 ))
+
+		through_k = np.empty( (n, n) )
+		for k in range(n):
+			# dist[i][j] = min( dist[i][j], dist[i][k] + dist[k][j] ), for all i, j at once:
+			# row i of through_k is row k shifted by dist[i][k]
+			np.add( dist[:,k,None], dist[k], out=through_k )
+			np.minimum( dist, through_k, out=dist )
+
+		negative = np.flatnonzero( dist.diagonal() < 0 )
+		if len(negative):
+			raise NegativeCycleException( [ self.labels[i] for i in self._negative_cycle() ] )
+
+		# the parent of j on a path from i is an in-neighbor u of j such that dist[i][u] + w(u,j) is minimal
+		pred = np.full( (n, n), -1, dtype=np.intc )
+		order = np.argsort( targets, kind='stable' )
+		in_sources, in_weights = sources[order], weights[order]
+		in_offsets = np.searchsorted( targets[order], np.arange( n+1 ))
+		dist_t = np.ascontiguousarray( dist.T )
+		columns = np.arange( n )
+		for j in range(n):
+			first, last = in_offsets[j], in_offsets[j+1]
+			if first == last:
+				continue
+			u = in_sources[first:last]
+			best = np.argmin( dist_t[u] + in_weights[first:last,None], axis=0 )
+			reached = np.isfinite( dist[:,j] ) & (columns != j)
+			pred[reached, j] = u[ best[reached] ]
+		return (dist, pred)
+
+	def _johnson(self):
+		n = len(self.labels)
+		offsets, targets = self.offsets, self.targets
+		weights = self.weights
+		h = [ 0.0 ] * n
+		if any( w < 0 for w in weights ):
+			h, cycle = self._bellman_ford_potentials()
+			if cycle is not None:
+				raise NegativeCycleException( [ self.labels[i] for i in cycle ] )
+			# w'(u,v) = w(u,v) + h(u) - h(v) >= 0
+			weights = array('d', weights)
+			for u in range(n):
+				for k in range( offsets[u], offsets[u+1] ):
+					weights[k] += h[u] - h[ targets[k] ]
+
+		dist = np.full( (n, n), np.inf )
+		pred = np.empty( (n, n), dtype=np.intc )
+		potentials = np.array( h )
+		for s in range(n):
+			distance, pi, color = [ Vertex.INFTY ] * n, [ -1 ] * n, [ Vertex.WHITE ] * n
+			self._dijkstra( s, weights, distance, pi, color )
+			reached = np.array( color ) == Vertex.BLACK
+			dist[s, reached] = ( np.array( distance )[reached] - h[s] + potentials[reached] )
+			pred[s] = pi
+		return (dist, pred)
+
+	def _bellman_ford_potentials(self):
+		""" Bellman-Ford, from a virtual source with a 0-weight edge to every vertex.
+
+		:return: the vertex potentials h (distances from the virtual source), and the ids of the vertices on a negative cycle (None if there is none)
+		:rtype: tuple
+		"""
+		n = len(self.labels)
+		offsets, targets, weights = self.offsets, self.targets, self.weights
+		h = [ 0.0 ] * n
+		pi = [ -1 ] * n
+		for _ in range(n):
+			changed = -1
+			for u in range(n):
+				hu = h[u]
+				for k in range( offsets[u], offsets[u+1] ):
+					v = targets[k]
+					d = hu + weights[k]
+					if d < h[v]:
+						h[v] = d
+						pi[v] = u
+						changed = v
+			if changed == -1:
+				return (h, None)
+		return (h, self._parent_cycle( pi, changed ))
+
+	def _parent_cycle(self, pi, v):
+		""" Find a cycle in the parent array, from a vertex that was still relaxed after |V| passes of Bellman-Ford: walking back |V| parents from it leads into the cycle.
+
+		:param pi: parent array
+		:type pi: list
+		:param v: id of the last relaxed vertex
+		:type v: int
+		:return: the ids of the vertices on the cycle, in path order
+		:rtype: list
+		"""
+		for _ in range(len(self.labels)):
+			v = pi[v]
+		cycle = [ v ]
+		u = pi[v]
+		while u != v:
+			cycle.append( u )
+			u = pi[u]
+		cycle.reverse()
+		return cycle
+
+	def _negative_cycle(self):
+		return self._bellman_ford_potentials()[1]
+
+	def __str__(self):
+		return '\n'.join( '{}: {}'.format( self.labels[i], ' '.join( self.labels[j] for j in self.successors(i) )) for i in range(len(self.labels)) )
+
+
+class SearchState():
+	""" The result of one traversal of a FrozenGraph (or of a Graph, in detached mode).
+
+	The per-vertex values are stored in compact arrays indexed by vertex id, instead of Vertex attributes: the graph itself is never modified, so that any number of traversals can share it (even concurrently), and a new traversal needs no reset of the previous results.
+
+	- `distance`: distance from the source (Vertex.INFTY if not reachable)
+	- `pi`: parent in the search tree (-1 for none)
+	- `color`: Vertex.WHITE, Vertex.GRAY, or Vertex.BLACK
+	- `discovery`, `finish`: time stamps of a depth-first search
+
+	Arrays that a given algorithm does not compute are None.
+	"""
+
+	__slots__ = ('graph', 'distance', 'pi', 'color', 'discovery', 'finish')
+
+	def __init__(self, graph, distance=None, pi=None, color=None, discovery=None, finish=None):
+		"""
+		:param graph: the graph that has been traversed (for mapping labels to vertex ids)
+		:type graph: FrozenGraph
+		"""
+		self.graph = graph
+		self.distance = array('d', distance) if distance is not None else None
+		self.pi = array('i', pi) if pi is not None else None
+		self.color = array('b', color) if color is not None else None
+		self.discovery = array('i', discovery) if discovery is not None else None
+		self.finish = array('i', finish) if finish is not None else None
+
+	def distance_to(self, label):
+		"""
+		:param label: a vertex label
+		:type label: str
+		:return: the distance of this vertex from the source
+		"""
+		return self.distance[ self.graph.vertex_id( label ) ]
+
+	def path(self, target):
+		"""
+		Read a path out of the parent array.
+
+		:param target: label of the last vertex on the path
+		:type target: str
+		:return: the list of labels from the root of the search tree to the target
+		:rtype: list
+		"""
+		path = []
+		i = self.graph.vertex_id( target )
+		while i != -1:
+			path.append( self.graph.labels[i] )
+			i = self.pi[i]
+		path.reverse()
+		return path
+
 		
 class GraphUnitTest( unittest.TestCase ):
 
@@ -776,6 +2176,529 @@ class GraphUnitTest( unittest.TestCase ):
 		#self.assertEqual( g.Matrix[0][3], 5)
 
 
+	def test_sparse_matrix(self):
+		""" Only actual edges are stored in the weight matrix """
+		g = self.make_dijkstra_graph()
+		self.assertEqual( sum( len(row) for row in g.Matrix.values()), 10)
+		self.assertEqual( g.weight( g.V['s'], g.V['t']), 10)
+		self.assertEqual( g.weight( g.V['t'], g.V['s']), None)
+
+	def test_sparse_matrix_copy(self):
+		""" Tree copy keeps only the tree edges """
+		g = self.make_dijkstra_graph()
+		g.dijkstra('s')
+		t = g.get_tree()
+		self.assertEqual( sum( len(row) for row in t.Matrix.values()), 4)
+		self.assertEqual( t.weight( t.V['y'], t.V['t']), 3)
+		self.assertEqual( g.weight( g.V['z'], g.V['s']), 7)
+
+	def test_frozen_graph_csr(self):
+		""" CSR arrays """
+		f = self.make_dijkstra_graph().freeze()
+		self.assertEqual( list(f.offsets), [0, 2, 4, 5, 8, 10])
+		self.assertEqual( [ f.labels[i] for i in f.successors( f.vertex_id('y')) ], ['t', 'x', 'z'])
+		self.assertRaises( AttributeError, setattr, f, 'directed', False)
+
+	def test_frozen_graph_breadth_first(self):
+		g = self.make_sample_digraph()
+		state = g.freeze().breadth_first('a')
+		g.breadth_first('a')
+		self.assertEqual( list(state.distance), [ v.distance for v in g.V.values() ])
+		self.assertEqual( list(state.pi), [ list(g.V).index(v.pi.label) if v.pi else -1 for v in g.V.values() ])
+
+	def test_frozen_graph_dijkstra(self):
+		g = self.make_dijkstra_graph_3()
+		f = g.freeze()
+		state = f.dijkstra('s')
+		g.dijkstra('s')
+		self.assertEqual( list(state.distance), [ v.distance for v in g.V.values() ])
+		self.assertEqual( state.path('f'), ['s','e','c','f'])
+		self.assertEqual( state.distance_to('f'), 9)
+		# the graph is not modified: a second run gives the same result
+		self.assertEqual( list(f.dijkstra('s').pi), list(state.pi))
+
+	def test_frozen_graph_dag_shortest_path(self):
+		g = self.make_weighted_dag()
+		f = g.freeze()
+		state = f.dag_shortest_path('s')
+		g.dag_shortest_path('s')
+		self.assertEqual( list(state.distance), [ v.distance for v in g.V.values() ])
+		self.assertEqual( state.path('z'), ['s','x','y','z'])
+		self.assertEqual( [ f.labels[i] for i in f.topo_sort() ], [ v.label for v in self.make_weighted_dag().topo_sort() ])
+
+	def test_frozen_graph_depth_first(self):
+		g = self.make_sample_digraph_2()
+		state = g.freeze().depth_first()
+		g.depth_first()
+		self.assertEqual( list(state.discovery), [ v.discovery for v in g.V.values() ])
+		self.assertEqual( list(state.finish), [ v.finish for v in g.V.values() ])
+		self.assertEqual( state.distance, None )
+
+	def test_dijkstra_indexed_heap(self):
+		""" Dijkstra with an indexed d-ary heap: same distances and parents as with the MinHeap """
+		for make_graph in (self.make_dijkstra_graph, self.make_dijkstra_graph_2, self.make_dijkstra_graph_3):
+			g = make_graph()
+			g.dijkstra('s')
+			for arity in (2,4,8):
+				h = make_graph()
+				h.dijkstra('s', arity=arity)
+				self.assertEqual( [ v.distance for v in h.V.values() ], [ v.distance for v in g.V.values() ])
+				self.assertEqual( [ v.pi and v.pi.label for v in h.V.values() ], [ v.pi and v.pi.label for v in g.V.values() ])
+
+	def test_dijkstra_target(self):
+		""" Point-to-point Dijkstra: same distance and path as a full run, fewer extracted vertices """
+		for make_graph in (self.make_dijkstra_graph_2, self.make_dijkstra_graph_3):
+			g = make_graph()
+			g.dijkstra('s')
+			for label, v in g.V.items():
+				h = make_graph()
+				self.assertEqual( h.dijkstra('s', target=label), v.distance )
+				self.assertEqual( h.V[label].pi and h.V[label].pi.label, v.pi and v.pi.label )
+		g = self.make_dijkstra_graph_3()
+		g.dijkstra('s', target='e')
+		self.assertEqual( [ v.label for v in g.V.values() if v.color == Vertex.BLACK ], ['e', 's'] )
+
+	def test_bidirectional_dijkstra(self):
+		""" Bidirectional Dijkstra: same distances as Dijkstra, and a shortest path in the pi pointers """
+		for make_graph in (self.make_dijkstra_graph, self.make_dijkstra_graph_2, self.make_dijkstra_graph_3):
+			g = make_graph()
+			g.dijkstra('s')
+			for label, v in g.V.items():
+				h = make_graph()
+				self.assertEqual( h.bidirectional_dijkstra('s', label), v.distance )
+				length, x = 0, h.V[label]
+				while x.pi is not None:
+					length += h.Matrix[x.pi][x]
+					x = x.pi
+				self.assertIs( x, h.V['s'] )
+				self.assertEqual( length, v.distance )
+		g = self.make_dijkstra_graph_3()
+		g.bidirectional_dijkstra('s', 'f')
+		self.assertEqual( [ g.V['f'].pi.label, g.V['c'].pi.label, g.V['e'].pi.label ], ['c','e','s'] )
+
+	def test_a_star(self):
+		""" A* on a grid: same distance as Dijkstra, fewer extracted vertices """
+		labels = [ '{}{}'.format(r, c) for r in 'abcdefgh' for c in range(8) ]
+		edges = [ (labels[i], labels[i+1], 1 + (i*7)%3) for i in range(64) if i%8 != 7 ] + [ (labels[i], labels[i+8], 1 + (i*5)%3) for i in range(56) ]
+		for heuristic in ('euclidean', 'manhattan', lambda u, v: 0):
+			g = Graph( labels, edges )
+			for i, label in enumerate(labels):
+				g.V[label].coord = (i%8, i//8)
+			distance, settled = g.a_star( 'a0', 'd4', heuristic )
+			h = Graph( labels, edges )
+			h.dijkstra( 'a0' )
+			self.assertEqual( distance, h.V['d4'].distance )
+			length, x = 0, g.V['d4']
+			while x.pi is not None:
+				length += g.Matrix[x.pi][x]
+				x = x.pi
+			self.assertEqual( length, distance )
+			if heuristic == 'manhattan':
+				self.assertLess( settled, len([ v for v in h.V.values() if v.distance <= distance ]) )
+		self.assertRaises( ValueError, g.a_star, 'a0', 'd4', 'chebyshev' )
+
+	def test_wide_weights(self):
+		""" Distances are not capped: float and large integer weights, infinite distance for unreachable vertices """
+		make_graph = lambda: Graph(('a','b','c','d'), (('a','b',40000),('b','c',2**70),('a','c',0.5)), directed=True)
+		g = make_graph()
+		g.dijkstra('a')
+		self.assertEqual( g.V['b'].distance, 40000 )
+		self.assertEqual( g.V['c'].distance, 0.5 )
+		self.assertEqual( g.V['d'].distance, math.inf )
+		g = make_graph()
+		g.dag_shortest_path('b')
+		self.assertEqual( g.V['c'].distance, 2**70 )
+		self.assertEqual( g.V['a'].distance, math.inf )
+
+		with tempfile.TemporaryDirectory() as tmp:
+			dotfile = os.path.join( tmp, 'wide.dot' )
+			with open( dotfile, 'w' ) as out:
+				out.write('Digraph{\na [label="a"];\nb [label="b"];\nc [label="c"];\n\n')
+				out.write('a->b[label="2.5"];\nb->c[label="123456789012345678901234567890"];\na->c[label="-1e3"];\n}\n')
+			g = Graph.from_dot( dotfile )
+		self.assertEqual( g.weight( g.V['a'], g.V['b'] ), 2.5 )
+		self.assertEqual( g.weight( g.V['b'], g.V['c'] ), 123456789012345678901234567890 )
+		self.assertEqual( g.weight( g.V['a'], g.V['c'] ), -1000.0 )
+
+	def test_infinite_weights(self):
+		""" A positive infinite weight: the edge is never used; a negative infinite weight is rejected """
+		self.assertEqual( parse_weight('inf'), math.inf )
+		self.assertEqual( parse_weight('+inf'), math.inf )
+		self.assertEqual( parse_weight('1e400'), math.inf )
+		for string in ('-inf', '-1e400'):
+			with self.assertRaises( ValueError ):
+				parse_weight( string )
+
+		with tempfile.TemporaryDirectory() as tmp:
+			dotfile = os.path.join( tmp, 'inf.dot' )
+			with open( dotfile, 'w' ) as out:
+				out.write('digraph { a -> b [label="inf"]; b -> c [label=1]; a -> c [label=5]; }')
+			g = Graph.from_dot( dotfile )
+			self.assertEqual( g.weight( g.V['a'], g.V['b'] ), math.inf )
+			g.dijkstra('a')
+			self.assertEqual( [ g.V[v].distance for v in 'abc' ], [ 0, math.inf, 5 ] )
+			self.assertIs( g.V['c'].pi, g.V['a'] )
+			g.bellman_ford('a')
+			self.assertEqual( [ g.V[v].distance for v in 'abc' ], [ 0, math.inf, 5 ] )
+
+			with open( dotfile, 'w' ) as out:
+				out.write('digraph { a -> b [label="-inf"]; b -> c [label=1]; }')
+			with self.assertRaises( ValueError ):
+				Graph.from_dot( dotfile )
+
+	def test_from_dot_statements(self):
+		""" Several statements on a line, implicit vertices, subgraphs, and edges without a semicolon """
+		with tempfile.TemporaryDirectory() as tmp:
+			dotfile = os.path.join( tmp, 'statements.dot' )
+			with open( dotfile, 'w' ) as out:
+				out.write('graph { c; a -- b [label="3"]; "b" -- c [label=4] subgraph { d -- e } e -- a\n}\n')
+			g = Graph.from_dot( dotfile )
+		self.assertFalse( g.directed )
+		self.assertTrue( g.weighted )
+		self.assertEqual( list(g.V), ['a','b','c','d','e'] )
+		self.assertEqual( [ v.id for v in g.V.values() ], [0,1,2,3,4] )
+		self.assertEqual( [ v.label for v in g.Adj[ g.V['a'] ]], ['b','e'] )
+		self.assertEqual( g.weight( g.V['c'], g.V['b'] ), 4 )
+		self.assertEqual( g.weight( g.V['d'], g.V['e'] ), 1 )
+
+	def test_from_dot_to_lists(self):
+		dotfile = os.path.join( os.path.dirname( os.path.abspath( __file__ )), 'examples', 'weighted_dag.dot' )
+		vertices, edges, directed = Graph.from_dot_to_lists( dotfile )
+		self.assertTrue( directed )
+		self.assertEqual( vertices, ['r','s','t','x','y','z'] )
+		self.assertEqual( edges[:3], [('r','s',5), ('r','t',3), ('s','t',2)] )
+		self.assertEqual( len(edges), 10 )
+		g = Graph( vertices, edges, directed )
+		self.assertEqual( g.to_dot( Walk.BFS ), Graph.from_dot( dotfile ).to_dot( Walk.BFS ))
+
+		# generator mode: filtering the edges
+		vertices, edges, directed = Graph.from_dot_to_lists( dotfile, lazy=True )
+		self.assertEqual( vertices, [] )
+		negative = [ edge for edge in edges if edge[2] < 0 ]
+		self.assertEqual( negative, [('x','y',-1), ('y','z',-2)] )
+		self.assertEqual( vertices, ['r','s','t','x','y','z'] )
+
+	def test_from_dot_to_lists_closes_file(self):
+		""" The file is closed when the generator is closed before it is used, or when the header is invalid """
+		dotfile = os.path.join( os.path.dirname( os.path.abspath( __file__ )), 'examples', 'weighted_dag.dot' )
+		with warnings.catch_warnings( record=True ) as caught, tempfile.TemporaryDirectory() as tmp:
+			warnings.simplefilter('always')
+			vertices, edges, directed = Graph.from_dot_to_lists( dotfile, lazy=True )
+			edges.close()
+			vertices, edges, directed = Graph.from_dot_to_lists( dotfile, lazy=True )
+			del edges
+			invalid = os.path.join( tmp, 'invalid.dot' )
+			with open( invalid, 'w' ) as dot:
+				dot.write('tree { a -> b }')
+			with self.assertRaises( DotSyntaxError ):
+				Graph.from_dot_to_lists( invalid, lazy=True )
+			gc.collect()
+		self.assertEqual( [ w for w in caught if issubclass( w.category, ResourceWarning ) ], [] )
+
+	def test_unique_edges(self):
+		g = self.make_sample_undirected_graph()
+		edges = [ (u.label, v.label) for (u, v) in g.unique_edges() ]
+		# (every edge of this graph is given twice)
+		self.assertEqual( sorted( edges ), sorted( set( (u.label, v.label) for u in g.V.values() for v in g.Adj[u] if u.label < v.label )))
+		self.assertTrue( all( g.V[u].id < g.V[v].id for (u, v) in edges ))
+
+		# tree edges are only kept by the parent
+		g.breadth_first('a')
+		tree = g.get_tree()
+		self.assertEqual( sorted( (u.label, v.label) for (u, v) in tree.unique_edges() ), sorted( (v.pi.label, v.label) for v in g.V.values() if v.pi is not None ))
+
+		g = self.make_dijkstra_graph()
+		self.assertEqual( list( g.unique_edges() ), [ (u, v) for u in g.V.values() for v in g.Adj[u] ])
+
+	def test_frame_recorder(self):
+		""" Frames rebuilt from the deltas are identical to a full rendering at each step """
+		for g in (self.make_clrs_bfs_undirected_graph(), self.make_dijkstra_graph()):
+			source = next( iter( g.V.values() ))
+			g.initialize_single_source( source )
+			recorder = FrameRecorder( g, Walk.DIJKSTRA )
+			expected = [ g.to_dot( Walk.DIJKSTRA ) ]
+			recorder.frame( 0 )
+			# a few relaxation steps, then a change of predecessor
+			for i, u in enumerate( list( g.V.values() )[:4] ):
+				for v in g.Adj[u]:
+					g.relax( u, v )
+				u.color = Vertex.BLACK
+				recorder.touch( u, *g.Adj[u] )
+				recorder.frame( i+1, 'step {}'.format(i) )
+				expected.append( g.to_dot( Walk.DIJKSTRA, 'step {}'.format(i) ))
+			v = list( g.V.values() )[-1]
+			v.pi = None
+			recorder.touch( v )
+			recorder.frame( 5 )
+			expected.append( g.to_dot( Walk.DIJKSTRA ))
+			recorder.add( 6, g.get_tree().to_dot( Walk.DIJKSTRA ))
+			expected.append( g.get_tree().to_dot( Walk.DIJKSTRA ))
+
+			self.assertEqual( len(recorder), 7 )
+			self.assertEqual( list( recorder.frames() ), list( enumerate( expected )))
+
+	def test_frame_recorder_files(self):
+		""" Snapshots written at the end of a traversal: one per step, plus the final tree """
+		g = self.make_sample_digraph()
+		with tempfile.TemporaryDirectory() as tmp:
+			prefix = os.path.join( tmp, 'dfs_' )
+			g.depth_first( prefix )
+			names = sorted( os.listdir( tmp ))
+			self.assertEqual( names, [ 'dfs_{:02}.dot'.format(i) for i in range(1, 2*len(g.V)+2) ])
+			with open( os.path.join( tmp, names[-2] )) as dot:
+				self.assertEqual( dot.read(), g.to_dot( Walk.DFS ))
+
+	def test_snapshot_sinks(self):
+		""" The same frames in a directory, in memory, and in an archive """
+		with tempfile.TemporaryDirectory() as tmp:
+			self.make_dijkstra_graph().dijkstra('s', os.path.join( tmp, 'dijkstra_' ))
+			files = {}
+			for name in os.listdir( tmp ):
+				with open( os.path.join( tmp, name )) as dot:
+					files[ name ] = dot.read()
+
+			memory = MemorySink('dijkstra_')
+			self.make_dijkstra_graph().dijkstra('s', memory)
+			self.assertEqual( memory.frames, files )
+			self.assertEqual( list( memory.frames ), sorted( files ))
+
+			path = os.path.join( tmp, 'frames.zip' )
+			with ArchiveSink( path, 'dijkstra_', batch_size=4 ) as sink:
+				self.make_dijkstra_graph().dijkstra('s', sink)
+				self.make_dijkstra_graph().dijkstra('s', sink.with_prefix('blank_'), blank=True)
+			with zipfile.ZipFile( path ) as archive:
+				names = archive.namelist()
+				self.assertEqual( sorted( n for n in names if n.startswith('dijkstra_') ), sorted( files ))
+				self.assertEqual( archive.read('dijkstra_03.dot').decode('utf-8'), files['dijkstra_03.dot'] )
+				# no final tree for a blank template
+				self.assertEqual( len( names ), 2*len( files )-1 )
+
+	def test_bellman_ford(self):
+		""" Same distances as DAG shortest paths (negative weights) and as Dijkstra, in both modes """
+		for queue in (False, True):
+			g = self.make_weighted_dag()
+			g.bellman_ford('s', queue=queue)
+			dag = self.make_weighted_dag()
+			dag.dag_shortest_path('s')
+			self.assertEqual( [ v.distance for v in g.V.values() ], [ v.distance for v in dag.V.values() ])
+			self.assertEqual( [ v.pi for v in g.V.values() ], [ g.V[v.pi.label] if v.pi else None for v in dag.V.values() ])
+
+			for make_graph in (self.make_dijkstra_graph, self.make_dijkstra_graph_2, self.make_dijkstra_graph_3):
+				g = make_graph()
+				g.bellman_ford('s', queue=queue)
+				dijkstra = make_graph()
+				dijkstra.dijkstra('s')
+				self.assertEqual( [ v.distance for v in g.V.values() ], [ v.distance for v in dijkstra.V.values() ])
+
+	def test_bellman_ford_negative_cycle(self):
+		for queue in (False, True):
+			g = Graph(('a','b','c','d','e'), (('a','b',1),('b','c',2),('c','d',-4),('d','b',1),('d','e',1)), directed=True)
+			with self.assertRaises( NegativeCycleException ) as cm:
+				g.bellman_ford('a', queue=queue)
+			cycle = cm.exception.cycle
+			self.assertEqual( sorted(cycle), ['b','c','d'] )
+			# in path order
+			self.assertTrue( all( g.V[cycle[i]] in g.Adj[ g.V[cycle[i-1]] ] for i in range(3) ))
+
+			# not reachable from the source
+			g.bellman_ford('e', queue=queue)
+			self.assertEqual( g.V['b'].distance, Vertex.INFTY )
+
+	@unittest.skipIf( np is None, 'NumPy is not installed')
+	def test_all_pairs_shortest_paths(self):
+		""" Both methods agree with one Dijkstra run per source """
+		for make_graph in (self.make_dijkstra_graph, self.make_dijkstra_graph_2, self.make_dijkstra_graph_3):
+			g = make_graph()
+			f = g.freeze()
+			for method in ('floyd-warshall', 'johnson'):
+				dist, pred = g.all_pairs_shortest_paths( method )
+				for i, label in enumerate( f.labels ):
+					state = f.dijkstra( label )
+					for j in range( len(f) ):
+						if state.color[j] == Vertex.BLACK:
+							self.assertEqual( dist[i,j], state.distance[j] )
+						else:
+							self.assertEqual( dist[i,j], np.inf )
+							self.assertEqual( pred[i,j], -1 )
+		dist, pred = self.make_dijkstra_graph_3().all_pairs_shortest_paths()
+		f = self.make_dijkstra_graph_3().freeze()
+		s, t = f.vertex_id('s'), f.vertex_id('f')
+		self.assertEqual( dist[s,t], 9 )
+		path = [ t ]
+		while path[-1] != s:
+			path.append( pred[s, path[-1]] )
+		self.assertEqual( [ f.labels[i] for i in reversed(path) ], ['s','e','c','f'])
+
+	@unittest.skipIf( np is None, 'NumPy is not installed')
+	def test_all_pairs_shortest_paths_negative_weights(self):
+		g = self.make_weighted_dag()
+		g.dag_shortest_path('s')
+		s = g.freeze().vertex_id('s')
+		for method in ('floyd-warshall', 'johnson'):
+			dist, pred = self.make_weighted_dag().all_pairs_shortest_paths( method )
+			self.assertEqual( list(dist[s]), [ v.distance for v in g.V.values() ])
+
+		g = Graph(('a','b','c','d'), (('a','b',1),('b','c',-2),('c','b',1),('c','d',1)), directed=True)
+		for method in ('floyd-warshall', 'johnson'):
+			with self.assertRaises( NegativeCycleException ) as cm:
+				g.all_pairs_shortest_paths( method )
+			self.assertEqual( sorted(cm.exception.cycle), ['b','c'] )
+		with self.assertRaises( ValueError ):
+			g.all_pairs_shortest_paths('dantzig')
+
+	def test_shortest_paths_from(self):
+		""" Multi-source shortest paths, sequential and in worker processes """
+		g = self.make_dijkstra_graph_2()
+		sequential = g.shortest_paths_from( g.V.keys() )
+		parallel = g.shortest_paths_from( g.V.keys(), workers=2 )
+		for label, state in sequential.items():
+			self.assertEqual( (state.distance, state.pi), (parallel[label].distance, parallel[label].pi))
+			self.assertEqual( parallel[label].path('c'), state.path('c'))
+			h = self.make_dijkstra_graph_2()
+			h.dijkstra( label )
+			self.assertEqual( list(state.distance), [ v.distance for v in h.V.values() ])
+		self.assertRaises( LabelException, g.shortest_paths_from, ['s', 'x'] )
+
+	def test_detached_search(self):
+		""" Detached traversals: same results as the vertex attributes, that are left untouched """
+		def attributes(g):
+			return [ (v.distance, v.pi, v.color, v.discovery, v.finish) for v in g.V.values() ]
+
+		def pis(g):
+			ids = { v: i for i, v in enumerate( g.V.values() ) }
+			return [ ids[v.pi] if v.pi is not None else -1 for v in g.V.values() ]
+
+		for make_graph, source in ((self.make_dijkstra_graph, 's'), (self.make_weighted_dag, 's'), (self.make_sample_undirected_graph, 'a')):
+			runs = [ ('breadth_first', (source,)), ('depth_first', ()), ('dijkstra', (source,)), ('bellman_ford', (source,)) ]
+			if make_graph is self.make_weighted_dag:
+				runs = [ run for run in runs if run[0] != 'dijkstra' ] + [ ('dag_shortest_path', (source,)) ]
+			g = make_graph()
+			# the vertices keep the results of a former run
+			g.breadth_first( source )
+			before = attributes( g )
+			for name, args in runs:
+				state = getattr( g, name )( *args, detached=True )
+				self.assertEqual( attributes( g ), before )
+				expected = make_graph()
+				getattr( expected, name )( *args )
+				if name == 'depth_first':
+					self.assertEqual( list( state.discovery ), [ v.discovery for v in expected.V.values() ])
+					self.assertEqual( list( state.finish ), [ v.finish for v in expected.V.values() ])
+				else:
+					self.assertEqual( list( state.distance ), [ v.distance for v in expected.V.values() ])
+				if name != 'bellman_ford':
+					self.assertEqual( list( state.pi ), pis( expected ))
+			self.assertEqual( g.topo_sort( detached=True ), [ g.V[v.label] for v in make_graph().topo_sort() ] )
+			self.assertEqual( attributes( g ), before )
+
+		g = self.make_dijkstra_graph()
+		self.assertRaises( ValueError, g.dijkstra, 's', 'prefix_', detached=True )
+		self.assertRaises( ValueError, g.dijkstra, 's', target='x', detached=True )
+		self.assertRaises( ValueError, g.dijkstra, 's', arity=4, detached=True )
+		self.assertRaises( ValueError, g.bellman_ford, 's', queue=True, detached=True )
+
+		g = Graph(('a','b','c','d'), (('a','b',1),('b','c',2),('c','d',-4),('d','b',1)), directed=True)
+		with self.assertRaises( NegativeCycleException ) as cm:
+			g.bellman_ford('a', detached=True)
+		self.assertEqual( sorted( cm.exception.cycle ), ['b','c','d'] )
+
+	def test_detached_search_concurrent(self):
+		""" Detached queries share a graph; the array-backed view is rebuilt when the graph changes """
+		g = self.make_dijkstra_graph()
+		sources = list( g.V.keys() ) * 8
+		expected = [ list( g.freeze().dijkstra( s ).distance ) for s in sources ]
+		with concurrent.futures.ThreadPoolExecutor( max_workers=4 ) as pool:
+			results = list( pool.map( lambda s: list( g.dijkstra( s, detached=True ).distance ), sources ))
+		self.assertEqual( results, expected )
+		self.assertTrue( all( v.color == Vertex.WHITE and v.pi is None for v in g.V.values() ))
+
+		view = g.frozen_view()
+		self.assertIs( g.frozen_view(), view )
+		# no search has set the parents: all edges are removed
+		g.to_tree()
+		self.assertIsNot( g.frozen_view(), view )
+		self.assertEqual( g.dijkstra( 's', detached=True ).distance_to('z'), Vertex.INFTY )
+		view = g.frozen_view()
+		g.add_edge( 's', 'z', 1 )
+		self.assertIsNot( g.frozen_view(), view )
+		self.assertEqual( g.dijkstra( 's', detached=True ).distance_to('z'), 1 )
+
+	def test_frozen_graph_pickle(self):
+		f = self.make_weighted_dag().freeze()
+		g = pickle.loads( pickle.dumps( f ))
+		self.assertEqual( (g.labels, g.offsets, g.targets, g.weights), (f.labels, f.offsets, f.targets, f.weights))
+		self.assertEqual( g.dag_shortest_path('s').distance, f.dag_shortest_path('s').distance)
+
+	def test_binary_format(self):
+		for make_graph in (self.make_weighted_dag, self.make_sample_undirected_graph, self.make_sample_digraph):
+			g = make_graph()
+			f = g.freeze()
+			with tempfile.TemporaryDirectory() as tmp:
+				path = os.path.join( tmp, 'graph.bin' )
+				g.save_binary( path )
+				for mmap in (True, False):
+					h = Graph.load_binary( path, mmap )
+					self.assertEqual( (h.labels, h.directed, h.weighted), (f.labels, f.directed, f.weighted) )
+					self.assertEqual( (list(h.offsets), list(h.targets), list(h.weights)), (list(f.offsets), list(f.targets), list(f.weights)) )
+					self.assertEqual( list(h.breadth_first( f.labels[0] ).distance), list(f.breadth_first( f.labels[0] ).distance) )
+					self.assertRaises( TypeError, h.targets.__setitem__, 0, 1 )
+					# mapped arrays are pickled as arrays
+					self.assertEqual( pickle.loads( pickle.dumps( h )).targets, f.targets )
+					self.assertEqual( h.thaw().to_dot( Walk.BFS ), g.to_dot( Walk.BFS ))
+					del h
+
+				with open( path, 'r+b' ) as out:
+					out.write( b'DOTGRAPH' )
+				self.assertRaises( ValueError, Graph.load_binary, path )
+
+	def test_thaw_self_loop(self):
+		""" Self-loops survive a round trip through the CSR arrays, and through a binary file """
+		def adjacency(g):
+			return { u.label: [ v.label for v in lst ] for u, lst in g.Adj.items() }
+
+		for directed in (False, True):
+			g = Graph(('a','b'), (('a','a',2),('a','b',3)), directed=directed)
+			self.assertEqual( adjacency( g.freeze().thaw() ), adjacency( g ))
+			with tempfile.TemporaryDirectory() as tmp:
+				path = os.path.join( tmp, 'graph.bin' )
+				g.save_binary( path )
+				h = Graph.load_binary( path, mmap=False ).thaw()
+				self.assertEqual( adjacency( h ), adjacency( g ))
+				self.assertEqual( adjacency( h.freeze().thaw() ), adjacency( g ))
+				self.assertEqual( h.weight( h.V['a'], h.V['a'] ), 2 )
+
+	def test_vertex_ids(self):
+		""" Vertices are slotted, and carry stable integer ids """
+		g = self.make_dijkstra_graph()
+		self.assertEqual( [ v.id for v in g.V.values() ], [0, 1, 2, 3, 4] )
+		self.assertEqual( [ v.id for v in g.copy().V.values() ], [0, 1, 2, 3, 4] )
+		self.assertFalse( hasattr( g.V['s'], '__dict__' ))
+		g.dijkstra('s')
+		self.assertFalse( hasattr( g.V['s'], 'heap_index' ))
+
+	def test_depth_first_deep_path(self):
+		""" DFS does not recurse: a long path is not bounded by the recursion limit """
+		n = 5000
+		labels = [ 'v{:05}'.format(i) for i in range(n) ]
+		g = Graph( labels, [ (labels[i], labels[i+1]) for i in range(n-1) ], directed=True)
+		topo = g.topo_sort()
+		self.assertEqual( [ v.label for v in topo ], labels )
+		self.assertEqual( g.V[labels[-1]].discovery, n )
+		self.assertEqual( g.V[labels[-1]].finish, n+1 )
+		self.assertEqual( g.V[labels[0]].finish, 2*n )
+		self.assertIs( g.V[labels[-1]].pi, g.V[labels[-2]] )
+
+	def test_sorted_adjacency(self):
+		""" Adjacency lists in label order, cached until the graph changes """
+		g = Graph( ('a','b','c','d'), (('a','d'),('a','b'),('a','c'),('c','b')), directed=True)
+		a = g.V['a']
+		self.assertEqual( [ v.label for v in g.Adj[a] ], ['d','b','c'])
+		self.assertEqual( [ v.label for v in g.sorted_adjacency()[a] ], ['b','c','d'])
+		self.assertIs( g.sorted_adjacency(), g.sorted_adjacency())
+		g.breadth_first('a')
+		g.to_tree()
+		self.assertEqual( [ v.label for v in g.sorted_adjacency()[ g.V['c'] ] ], [])
+
 	def atest_dag_shortest_path_1(self):
 		""" Cormen Figure 24.5, p. 656 """
 		g = self.make_weighted_dag()
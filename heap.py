@@ -2,6 +2,8 @@
 
 import unittest
 import sys
+import random
+import heapq
 
 class MaxHeap(object):
 	""" A heap-beased priority queue implementation. This is a generic priority queue structure:
@@ -27,6 +29,10 @@ class MaxHeap(object):
 
 		next_vertex = myMaxQueue.extract_max()
 
+	4. After increasing the key of an object still in the queue::
+
+		myMaxQueue.float_item( vertex )
+
 	In order to construct a Min-Priority queue, just use the `MinHeap()` constructor instead (there is no need to change the `__gt__` function), and call the appropriate method: `extract_min()`.
 	
 	"""
@@ -43,6 +49,8 @@ class MaxHeap(object):
 		# _new array_ (the original array stays untouched)
 		self.array = [ item for item in array ]
 		self.size = 0
+		# position of every (custom) object in the heap array
+		self.index = {}
 		self.custom_type = False
 		if not isinstance(self.array[0],(int,float,str)):
 			self.custom_type = True
@@ -67,21 +75,13 @@ class MaxHeap(object):
 	def build_heap(self):
 		""" Build a heap from an array of primitive types, or custom objects.
 
-		If elements in the array are custom objects, decorate them with the following attributes
-			- heap_index: keep track of the object position in the heap array
-			- heap: a back reference to the heap itself
-			- float_key(i): the decrease/increase key function
+		If elements in the array are custom objects, their positions in the heap array are tracked in the `index` dictionary (the objects themselves are not modified): see `float_item()`.
 		 """
 		self.size = len(self.array)
+		if self.custom_type:
+			self.index = { item: idx for idx, item in enumerate(self.array) }
 		for i in reversed (range (0, (len(self.array))//2)):
 			self.heapify(i)
-
-		# Add a heap-friendly attributes to the type being manipulated
-		if self.custom_type:
-			for idx in range(0, len(self.array)):
-				self.array[idx].heap_index = idx		
-				self.array[idx].heap = self
-				self.array[idx].float_key = lambda x: self.float_key( x )
 	
 	
 	def heapify(self, i):
@@ -107,8 +107,8 @@ class MaxHeap(object):
 			self.array[i] = temp 
 
 			if self.custom_type:
-				self.array[largest].heap_index = largest
-				self.array[i].heap_index = i
+				self.index[ self.array[largest] ] = largest
+				self.index[ self.array[i] ] = i
 
 			self.heapify(largest)
 
@@ -121,17 +121,30 @@ class MaxHeap(object):
 		:param i: index of the element whose key needs to float up.
 		:type i: int
 		"""
-		parent_idx = self.parent(i)
-		while i > 0 and self._compare(self.array[i], self.array[ self.parent(i) ]) :
+		while i > 0:
+			parent_idx = self.parent(i)
+			if not self._compare(self.array[i], self.array[ parent_idx ]):
+				break
 			tmp = self.array[i]
-			self.array[i] = self.array[ self.parent(i) ] 
-			self.array[ self.parent(i) ] = tmp
+			self.array[i] = self.array[ parent_idx ] 
+			self.array[ parent_idx ] = tmp
 
 			if self.custom_type:
-				self.array[i].heap_index = i
-				self.array[self.parent(i) ].heap_index = self.parent(i)
+				self.index[ self.array[i] ] = i
+				self.index[ self.array[ parent_idx ] ] = parent_idx
+
+			i = parent_idx
 
-			i = self.parent(i)
+	def float_item(self, item):
+		"""
+		Float an object up in the tree, after its key has been increased (MaxHeap) or decreased (MinHeap).
+
+		:param item: an object that is still in the queue
+		"""
+		self.float_key( self.index[item] )
+
+	def __contains__(self, item):
+		return item in self.index
 
 	def extract_max(self):
 		""" Extract the element with the largest key.
@@ -158,7 +171,8 @@ class MaxHeap(object):
 		self.array[0] = self.array[self.size-1]
 
 		if self.custom_type:
-			self.array[0].heap_index = 0
+			self.index[ self.array[0] ] = 0
+			del self.index[ first ]
 
 		self.size -= 1
 		self.heapify(0) 
@@ -199,7 +213,7 @@ class MaxHeap(object):
 		return 2*(i+1)
 
 	def parent(self, i):
-		return i//2
+		return (i-1)//2
 
 	def __str__(self):
 		return '{}'.format([ str(item) for item in self.array[0:(self.size)] ])
@@ -217,6 +231,258 @@ class MinHeap( MaxHeap ):
 		return self.extract_first()
 
 
+class IndexedMinHeap(object):
+	""" An indexed d-ary min-priority queue.
+
+	Unlike MaxHeap and MinHeap, this queue does not decorate the objects it contains: each object is pushed together with an explicit key, and the queue returns an integer handle, that identifies the entry in subsequent calls to `decrease_key()`. Keys, objects and heap positions are kept in side arrays, indexed by handle.
+
+	Keys can be any comparable values. Tuples such as `(distance, label)` make the extraction order deterministic when distances are equal.
+
+	Example::
+
+		queue = IndexedMinHeap( arity=4 )
+		handle = queue.push( vertex, vertex.distance )
+		...
+		queue.decrease_key( handle, new_distance )
+		next_vertex = queue.extract_min()
+
+	A larger arity makes the tree shallower (cheaper `decrease_key()`), at the cost of more comparisons per level in `extract_min()`.
+	"""
+
+	def __init__(self, arity=2):
+		"""
+		Create an empty queue.
+
+		:param arity: number of children of a node in the heap (typically 2, 4, or 8)
+		:type arity: int
+		"""
+		if arity < 2:
+			raise ValueError('Heap arity must be at least 2 (got {})'.format(arity))
+		self.arity = arity
+		# the heap itself: an array of handles
+		self.heap = []
+		# side arrays, indexed by handle
+		self.keys = []
+		self.items = []
+		# position of a handle in the heap array (-1 once extracted)
+		self.position = []
+
+	def push(self, item, key):
+		"""
+		Insert an object in the queue.
+
+		:param item: the object to be prioritized
+		:param key: its key
+		:return: a handle, to be passed to `decrease_key()`
+		:rtype: int
+		"""
+		handle = len(self.keys)
+		self.keys.append( key )
+		self.items.append( item )
+		self.position.append( len(self.heap) )
+		self.heap.append( handle )
+		self._sift_up( len(self.heap)-1 )
+		return handle
+
+	def decrease_key(self, handle, key):
+		"""
+		Decrease the key of an entry still in the queue, and restore the heap property.
+
+		:param handle: the handle returned by `push()`
+		:type handle: int
+		:param key: the new key, that must not be greater than the current one
+		"""
+		if self.position[handle] < 0:
+			raise KeyError('Entry {} is not in the queue anymore'.format(handle))
+		if key > self.keys[handle]:
+			raise ValueError('New key {} is greater than current key {}'.format(key, self.keys[handle]))
+		self.keys[handle] = key
+		self._sift_up( self.position[handle] )
+
+	def extract_min(self):
+		""" Extract the element with the smallest key.
+
+		:rtype: object
+		"""
+		return self.items[ self.extract_min_handle() ]
+
+	def extract_min_handle(self):
+		""" Extract the handle of the element with the smallest key.
+
+		:rtype: int
+		"""
+		if not self.heap:
+			raise IndexError('extract from an empty queue')
+		heap = self.heap
+		first = heap[0]
+		last = heap.pop()
+		self.position[first] = -1
+		if heap:
+			heap[0] = last
+			self.position[last] = 0
+			self._sift_down(0)
+		return first
+
+	def peek(self):
+		""" The element with the smallest key (not removed from the queue).
+
+		:rtype: object
+		"""
+		return self.items[ self.heap[0] ]
+
+	def key(self, handle):
+		""" The current key of an entry. """
+		return self.keys[handle]
+
+	def __contains__(self, handle):
+		return 0 <= handle < len(self.position) and self.position[handle] >= 0
+
+	def __len__(self):
+		return len(self.heap)
+
+	def is_empty(self):
+		""" Check if the queue is empty.
+
+		:return: Return true if the priority queue is empty; false otherwise.
+		:rtype: boolean
+		"""
+		return not self.heap
+
+	def list(self):
+		"""
+		Return a list of the elements that are still in the queue, sorted by key.
+
+		:rtype: list
+		"""
+		return [ self.items[h] for h in sorted( self.heap, key=lambda h: self.keys[h] ) ]
+
+	def _sift_up(self, i):
+		""" Float the entry at position i up the tree.
+
+		The entry is not swapped at each level: its ancestors are moved down until its final position is found.
+		"""
+		heap, keys, position, arity = self.heap, self.keys, self.position, self.arity
+		handle = heap[i]
+		key = keys[handle]
+		while i > 0:
+			parent = (i-1)//arity
+			parent_handle = heap[parent]
+			if not key < keys[parent_handle]:
+				break
+			heap[i] = parent_handle
+			position[parent_handle] = i
+			i = parent
+		heap[i] = handle
+		position[handle] = i
+
+	def _sift_down(self, i):
+		""" Float the entry at position i down the tree (iterative). """
+		heap, keys, position, arity = self.heap, self.keys, self.position, self.arity
+		size = len(heap)
+		handle = heap[i]
+		key = keys[handle]
+		while True:
+			first_child = arity*i+1
+			if first_child >= size:
+				break
+			# smallest child
+			smallest = first_child
+			smallest_key = keys[heap[first_child]]
+			for c in range(first_child+1, min(first_child+arity, size)):
+				if keys[heap[c]] < smallest_key:
+					smallest = c
+					smallest_key = keys[heap[c]]
+			if not smallest_key < key:
+				break
+			heap[i] = heap[smallest]
+			position[heap[i]] = i
+			i = smallest
+		heap[i] = handle
+		position[handle] = i
+
+	def __str__(self):
+		return '{}'.format([ str(item) for item in self.list() ])
+
+
+class LazyMinHeap(object):
+	""" A min-priority queue with lazy deletion.
+
+	Decreasing the key of an object is just pushing it again with the smaller key: the outdated entries stay in the underlying binary heap, and are discarded when they reach the top. The queue only holds the objects that have been pushed, which makes it a good fit for searches that start from a single object, and may stop long before the queue is exhausted.
+
+	Objects must be hashable. Keys can be any comparable values (ex. `(distance, label)` pairs).
+	"""
+
+	def __init__(self):
+		# entries: (key, insertion counter, object); the counter keeps objects out of the comparisons
+		self.heap = []
+		# current key of every object in the queue
+		self.keys = {}
+		self.counter = 0
+
+	def push(self, item, key):
+		"""
+		Insert an object, or decrease the key of an object already in the queue.
+
+		:param item: the object to be prioritized
+		:param key: its (new) key
+		"""
+		self.keys[item] = key
+		heapq.heappush( self.heap, (key, self.counter, item) )
+		self.counter += 1
+
+	def extract_min(self):
+		""" Extract the element with the smallest key.
+
+		:rtype: object
+		"""
+		heap, keys = self.heap, self.keys
+		while heap:
+			key, count, item = heapq.heappop( heap )
+			# skip outdated entries
+			if item in keys and keys[item] == key:
+				del keys[item]
+				return item
+		raise IndexError('extract from an empty queue')
+
+	def min_key(self):
+		""" The smallest key in the queue (the queue is not modified, except for dropping outdated entries).
+
+		:return: the key of the next element to be extracted
+		"""
+		heap, keys = self.heap, self.keys
+		while heap:
+			key, count, item = heap[0]
+			if item in keys and keys[item] == key:
+				return key
+			heapq.heappop( heap )
+		raise IndexError('empty queue')
+
+	def __contains__(self, item):
+		return item in self.keys
+
+	def __len__(self):
+		return len(self.keys)
+
+	def is_empty(self):
+		""" Check if the queue is empty.
+
+		:return: Return true if the priority queue is empty; false otherwise.
+		:rtype: boolean
+		"""
+		return not self.keys
+
+	def list(self):
+		"""
+		Return a list of the elements that are still in the queue, sorted by key.
+
+		:rtype: list
+		"""
+		return sorted( self.keys, key=self.keys.get )
+
+	def __str__(self):
+		return '{}'.format([ str(item) for item in self.list() ])
+
+
 class HeapUnitTest( unittest.TestCase ):
 
 	def test_max_heap_creation_1(self):
@@ -248,14 +514,109 @@ class HeapUnitTest( unittest.TestCase ):
 	def test_min_queue_2(self):
 		""" MinQueue creation (nodes)  """
 		h = MinHeap([Node(16),Node(14),Node(10),Node(9),Node(8),Node(7),Node(4),Node(3),Node(2),Node(1)] )
-		h.extract_min()
+		first = h.extract_min()
 		self.assertEqual( h.size, 9 )
+		self.assertFalse( first in h )
+
+	def test_parent(self):
+		""" Parent index is consistent with left() and right() """
+		h = MaxHeap([1])
+		for i in range(100):
+			self.assertEqual( h.parent( h.left(i)), i )
+			self.assertEqual( h.parent( h.right(i)), i )
+
+	def test_min_queue_float_key(self):
+		""" Decreasing a key restores the heap order """
+		nodes = [ Node(k) for k in (1,2,3,4,5,6,7,8,9,10) ]
+		h = MinHeap( nodes )
+		nodes[9].key = 0
+		h.float_item( nodes[9] )
+		check_heap( self, h )
+		self.assertEqual( h.extract_min().key, 0 )
+
+	def test_min_queue_random_operations(self):
+		""" Random mix of extract/decrease-key operations """
+		rnd = random.Random(1)
+		for trial in range(20):
+			nodes = [ Node( rnd.randint(0, 1000)) for i in range(200) ]
+			h = MinHeap( nodes )
+			extracted = []
+			while not h.is_empty():
+				if rnd.random() < .6:
+					node = h.array[ rnd.randrange(h.size) ]
+					node.key -= rnd.randint(0, 100)
+					h.float_item( node )
+				else:
+					extracted.append( h.extract_min().key )
+					self.assertTrue( all( extracted[-1] <= h.array[i].key for i in range(h.size) ))
+				check_heap( self, h )
+
+	def test_objects_untouched(self):
+		""" No attribute is added to the queued objects """
+		nodes = [ Node(k) for k in (3,1,2) ]
+		h = MinHeap( nodes )
+		h.extract_min()
+		self.assertEqual( [ vars(n) for n in nodes ], [ {'key': 3}, {'key': 1}, {'key': 2} ])
 
 	def test_heapsort(self):
 		h = MinHeap( [ 1,3,2,4,6,5,11,10,15,9 ])
 		h.sort()
 		self.assertEqual( h.array, [15,11,10,9,6,5,4,3,2,1])
 
+class IndexedMinHeapUnitTest( unittest.TestCase ):
+
+	def test_extract_order(self):
+		""" Extraction order, for several arities """
+		keys = [16,14,10,9,8,7,4,3,2,1,5,11,15]
+		for arity in (2,4,8):
+			h = IndexedMinHeap( arity )
+			for k in keys:
+				h.push( Node(k), k )
+			self.assertEqual( [ h.extract_min().key for k in keys ], sorted(keys))
+			self.assertTrue( h.is_empty() )
+
+	def test_decrease_key(self):
+		h = IndexedMinHeap( 4 )
+		handles = [ h.push( Node(k), k ) for k in (16,14,10,9,8) ]
+		h.decrease_key( handles[0], 1 )
+		self.assertEqual( h.peek().key, 16 )
+		self.assertEqual( h.extract_min_handle(), handles[0] )
+		self.assertFalse( handles[0] in h )
+		self.assertRaises( KeyError, h.decrease_key, handles[0], 0 )
+		self.assertRaises( ValueError, h.decrease_key, handles[1], 20 )
+
+	def test_objects_untouched(self):
+		""" No attribute is added to the queued objects """
+		n = Node(3)
+		h = IndexedMinHeap()
+		h.push( n, 3 )
+		self.assertEqual( vars(n), {'key': 3} )
+
+def check_heap(test, h):
+	""" Assert the heap property, and the consistency of the position index. """
+	for i in range(1, h.size):
+		test.assertFalse( h._compare( h.array[i], h.array[ h.parent(i) ] ))
+	if h.custom_type:
+		test.assertEqual( len(h.index), h.size )
+		for i in range(h.size):
+			test.assertEqual( h.index[ h.array[i] ], i )
+
+class LazyMinHeapUnitTest( unittest.TestCase ):
+
+	def test_extract_order(self):
+		h = LazyMinHeap()
+		nodes = [ Node(k) for k in (16,14,10,9,8) ]
+		for n in nodes:
+			h.push( n, n.key )
+		h.push( nodes[0], 1 )
+		h.push( nodes[2], 9.5 )
+		self.assertEqual( len(h), 5 )
+		self.assertEqual( [ n.key for n in h.list() ], [16,8,9,10,14] )
+		self.assertEqual( h.min_key(), 1 )
+		self.assertEqual( [ h.extract_min().key for i in range(5) ], [16,8,9,10,14] )
+		self.assertTrue( h.is_empty() )
+		self.assertRaises( IndexError, h.extract_min )
+
 class Node(object):
 	def __init__(self,key):
 		self.key = key
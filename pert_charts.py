@@ -7,18 +7,18 @@ from graph import *
 
 class PERTGraph ( Graph ):
 
-	def dag_longest_path(self,source, file_prefix='', blank=False):
+	def dag_longest_path(self,source, sink=None, blank=False):
 		"""
 		Run the DAG longest-path algorithm.
 
 		:param source: label or index of the source vertex 
 		:type source: str
-		:param file_prefix: if provided, the procedure generates .dot diagrams for each step; dot filenames concatenate this prefix with a number suffix.
-		:type file_prefix: str
+		:param sink: if provided, the procedure generates .dot diagrams for each step: a SnapshotSink, or a file prefix (dot filenames concatenate this prefix with a number suffix).
+		:type sink: SnapshotSink or str
 		:param blank: if True, the procedure generates only .dot templates for each step; the colors and attributes of the node are not shown.
 		:param blank: bool
 		"""
-		self.dag_shortest_path(source, file_prefix=file_prefix, blank=blank)
+		self.dag_shortest_path(source, sink=sink, blank=blank)
 
 	def dag_critical_path(self,source):
 		""" Compute a critical path in the graph.
@@ -53,12 +53,10 @@ class PERTGraph ( Graph ):
 		:type u: Vertex
 		:type v: Vertex
 		"""
-		if v.distance < (u.distance + self.Matrix[u][v] ):
-			#log('PERT relax({},{}): {} --> {}'.format(u.label, v.label, v.distance, (u.distance + self.Matrix[u][v])),3)
-			v.distance = (u.distance + self.Matrix[u][v] )
-
-			if hasattr(v,'heap') and v.heap is not None:
-				v.float_key( v.heap_index )
+		d = u.distance + self.Matrix[u][v]
+		if v.distance < d:
+			#log('PERT relax({},{}): {} --> {}'.format(u.label, v.label, v.distance, d),3)
+			v.distance = d
 			v.pi = u
 
 	
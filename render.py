@@ -0,0 +1,432 @@
+#!/usr/bin/python3
+
+"""
+Rendering of the snapshot diagrams (.dot files) into images, with a bounded pool of concurrent renderers.
+
+A renderer is a function that takes the path of a .dot file and the path of the image to be produced. By default, each file is rendered by a Graphviz `dot` subprocess: the pool runs up to `workers` of them at the same time (the waiting is done by threads, the work by the subprocesses). Any function with the same signature can stand in for `dot` (ex. in tests).
+
+Rendered images can be kept in a :class:`RenderCache`, keyed by the content of the .dot file and the version of the renderer: frames that have already been rendered (in a previous build, or by another exercise with identical frames, such as a blank template and its key) are copied from the cache instead.
+
+Ex.::
+
+	pool = RenderPool( workers=4, cache=RenderCache('.render_cache', version=command_version()) )
+	for result in pool.render( glob.glob('dijkstra_*.dot') ):
+		print(result.target, result.seconds, result.cached)
+	print(pool.cache.stats())
+"""
+
+import unittest
+import collections as clt
+import concurrent.futures
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+
+# the source and target files of a rendered frame, the time spent on it (in seconds), and whether it was copied from the cache
+RenderResult = clt.namedtuple('RenderResult', ['source', 'target', 'seconds', 'cached'], defaults=[False])
+
+
+def command_renderer(command=('dot',), format='pdf'):
+	""" Return a renderer that runs a Graphviz-compatible command: `<command> -T<format> <source> -o <target>`.
+
+	:param command: the command and its first arguments
+	:type command: tuple
+	:param format: the output format
+	:type format: str
+	:return: a renderer function
+	:rtype: function
+	:raises subprocess.CalledProcessError: (from the renderer) if the command fails
+	"""
+	def render(source, target):
+		subprocess.run( list(command) + [ '-T{}'.format(format), source, '-o', target ], check=True )
+	return render
+
+
+def command_version(command=('dot',)):
+	""" Return the version string of a Graphviz-compatible command (the output of `<command> -V`), to be used as a part of the cache keys.
+
+	:param command: the command and its first arguments
+	:type command: tuple
+	:rtype: str
+	:raises subprocess.CalledProcessError: if the command fails
+	"""
+	process = subprocess.run( list(command) + [ '-V' ], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=True )
+	return process.stdout.decode('utf-8', 'replace').strip()
+
+
+class RenderCache():
+	""" A content-addressed cache of rendered images, stored in a directory.
+
+	An entry is keyed by a hash of the DOT text, of the output format, and of the renderer version. When the total size of the entries exceeds `max_bytes`, the least recently used entries are removed (the modification time of an entry is updated when it is used, so that the order survives between runs).
+
+	The cache can be used by several threads; several processes may share a directory (an entry is written to a temporary file first, then renamed).
+
+	:param directory: the cache directory (created if needed)
+	:type directory: str
+	:param max_bytes: the maximum total size of the entries
+	:type max_bytes: int
+	:param version: the renderer version (ex. the output of :func:`command_version`)
+	:type version: str
+	"""
+
+	def __init__(self, directory, max_bytes=256*2**20, version=''):
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.version = version
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.lock = threading.Lock()
+		os.makedirs( directory, exist_ok=True )
+
+		# entry name -> size, from the least recently used to the most recently used
+		self.entries = clt.OrderedDict()
+		self.size = 0
+		listing = []
+		for entry in os.scandir( directory ):
+			if entry.is_file() and not entry.name.startswith('.'):
+				stat = entry.stat()
+				listing.append( (stat.st_mtime, entry.name, stat.st_size) )
+		for mtime, name, size in sorted( listing ):
+			self.entries[ name ] = size
+			self.size += size
+		# the directory may have been filled with a larger limit
+		with self.lock:
+			self.evict()
+
+	def key(self, dot, format):
+		""" The entry name for a frame.
+
+		:param dot: the content of a .dot file
+		:type dot: bytes
+		:param format: the output format
+		:type format: str
+		:rtype: str
+		"""
+		h = hashlib.sha256()
+		for part in (self.version.encode('utf-8'), format.encode('utf-8'), dot):
+			h.update( len(part).to_bytes(8, 'little') )
+			h.update( part )
+		return '{}.{}'.format( h.hexdigest(), format.split(':')[0] )
+
+	def get(self, key, target):
+		""" Copy an entry to the target file, if it is in the cache.
+
+		:param key: an entry name
+		:type key: str
+		:param target: the file to be written
+		:type target: str
+		:return: True on a hit
+		:rtype: bool
+		"""
+		path = os.path.join( self.directory, key )
+		try:
+			shutil.copyfile( path, target )
+			os.utime( path )
+			size = os.path.getsize( path )
+		except FileNotFoundError:
+			# not in the cache, or evicted by another process
+			with self.lock:
+				self.misses += 1
+				self.discard( key )
+			return False
+		with self.lock:
+			self.hits += 1
+			if key in self.entries:
+				self.entries.move_to_end( key )
+			else:
+				# stored by another process
+				self.entries[ key ] = size
+				self.size += size
+				self.evict()
+		return True
+
+	def put(self, key, source):
+		""" Store a rendered image, and evict the least recently used entries if the cache is full.
+
+		:param key: an entry name
+		:type key: str
+		:param source: the rendered image
+		:type source: str
+		"""
+		path = os.path.join( self.directory, key )
+		fd, temporary = tempfile.mkstemp( dir=self.directory, prefix='.' )
+		os.close( fd )
+		shutil.copyfile( source, temporary )
+		os.replace( temporary, path )
+		size = os.path.getsize( path )
+		with self.lock:
+			self.discard( key )
+			self.entries[ key ] = size
+			self.size += size
+			self.evict()
+
+	def evict(self):
+		# (with the lock held) remove the least recently used entries, until the total size fits; the most recent entry is kept
+		while self.size > self.max_bytes and len(self.entries) > 1:
+			name, old = self.entries.popitem( last=False )
+			self.size -= old
+			self.evictions += 1
+			try:
+				os.remove( os.path.join( self.directory, name ))
+			except FileNotFoundError:
+				pass
+
+	def discard(self, key):
+		# (with the lock held)
+		if key in self.entries:
+			self.size -= self.entries.pop( key )
+
+	def stats(self):
+		""" A summary of the cache activity.
+
+		:rtype: str
+		"""
+		requests = self.hits + self.misses
+		return 'render cache: {} hits, {} misses ({:.0%} hit rate), {} evictions, {} entries ({} bytes)'.format(
+			self.hits, self.misses, self.hits / requests if requests else 0, self.evictions, len(self.entries), self.size )
+
+
+class RenderPool():
+	""" Render .dot files concurrently.
+
+	:param renderer: a function `renderer(source, target)`; by default, Graphviz `dot`.
+	:type renderer: function
+	:param workers: the maximum number of frames rendered at the same time; by default, the number of processors.
+	:type workers: int
+	:param format: the output format, which is also the extension of the target files.
+	:type format: str
+	:param cache: if provided, the frames found in this cache are not rendered again.
+	:type cache: RenderCache
+	"""
+
+	def __init__(self, renderer=None, workers=None, format='pdf', cache=None):
+		self.format = format
+		self.cache = cache
+		# lock stripes, selected by cache key: identical frames are rendered once, even when they are rendered at the same time
+		# (a fixed number of locks, however many frames go through the pool; frames that share a stripe wait for each other)
+		self.key_locks = [ threading.Lock() for _ in range(64) ]
+		self.renderer = renderer if renderer is not None else command_renderer( format=format )
+		self.workers = workers if workers is not None else (os.cpu_count() or 1)
+
+	def target(self, source):
+		""" The image file for a .dot file: same name, with the format as an extension.
+
+		:param source: a .dot file
+		:type source: str
+		:rtype: str
+		"""
+		return '{}.{}'.format( os.path.splitext( source )[0], self.format )
+
+	def render_one(self, source):
+		""" Render a single file, and time it.
+
+		:param source: a .dot file
+		:type source: str
+		:rtype: RenderResult
+		"""
+		target = self.target( source )
+		start = time.perf_counter()
+		if self.cache is None:
+			self.renderer( source, target )
+			return RenderResult( source, target, time.perf_counter() - start )
+
+		with open( source, 'rb' ) as dot:
+			key = self.cache.key( dot.read(), self.format )
+		with self.key_locks[ hash( key ) % len(self.key_locks) ]:
+			if self.cache.get( key, target ):
+				return RenderResult( source, target, time.perf_counter() - start, True )
+			self.renderer( source, target )
+			self.cache.put( key, target )
+		return RenderResult( source, target, time.perf_counter() - start )
+
+	def render(self, sources):
+		""" Render the files, with at most `workers` of them at the same time.
+
+		:param sources: .dot files
+		:type sources: list
+		:return: one RenderResult per file, in the order of the sources
+		:rtype: list
+		:raises: the first exception raised by the renderer, once the other frames are done
+		"""
+		sources = list( sources )
+		if self.workers <= 1 or len(sources) <= 1:
+			return [ self.render_one( source ) for source in sources ]
+		with concurrent.futures.ThreadPoolExecutor( max_workers=self.workers ) as executor:
+			return list( executor.map( self.render_one, sources ))
+
+
+def timing_report(results, seconds=None):
+	""" A report of the rendering times: one line per frame, and a total.
+
+	:param results: RenderResult objects
+	:type results: list
+	:param seconds: the elapsed (wall clock) time, if known
+	:type seconds: float
+	:rtype: str
+	"""
+	lines = [ '{:>8.3f}s  {}{}'.format( r.seconds, r.target, ' (cached)' if r.cached else '' ) for r in results ]
+	total = sum( r.seconds for r in results )
+	if seconds is None:
+		lines.append( '{:>8.3f}s  total ({} frames)'.format( total, len(results) ))
+	else:
+		lines.append( '{:>8.3f}s  total ({} frames, {:.3f}s elapsed)'.format( total, len(results), seconds ))
+	return '\n'.join( lines )
+
+
+class RenderPoolUnitTest( unittest.TestCase ):
+
+	def make_sources(self, tmp, count):
+		sources = []
+		for i in range(count):
+			source = os.path.join( tmp, 'frame_{:02}.dot'.format(i) )
+			with open( source, 'w' ) as dot:
+				dot.write( 'Digraph {{\nv{};\n}}'.format(i) )
+			sources.append( source )
+		return sources
+
+	def test_stand_in_renderer(self):
+		""" Frames are rendered concurrently, up to the number of workers """
+		lock = threading.Lock()
+		running = [ 0, 0 ]
+
+		def renderer(source, target):
+			with lock:
+				running[0] += 1
+				running[1] = max( running )
+			time.sleep( .02 )
+			with open( source ) as src, open( target, 'w' ) as out:
+				out.write( src.read().upper() )
+			with lock:
+				running[0] -= 1
+
+		with tempfile.TemporaryDirectory() as tmp:
+			sources = self.make_sources( tmp, 12 )
+			results = RenderPool( renderer, workers=3, format='txt' ).render( sources )
+			self.assertEqual( [ r.source for r in results ], sources )
+			self.assertEqual( [ r.target for r in results ], [ s[:-3] + 'txt' for s in sources ] )
+			self.assertTrue( all( r.seconds >= .02 for r in results ))
+			self.assertTrue( 1 < running[1] <= 3 )
+			with open( results[5].target ) as out:
+				self.assertEqual( out.read(), 'DIGRAPH {\nV5;\n}' )
+			self.assertEqual( len( timing_report( results ).split('\n') ), 13 )
+
+	def test_render_cache(self):
+		""" Frames with the same content are rendered once """
+		calls = []
+		lock = threading.Lock()
+
+		def renderer(source, target):
+			with lock:
+				calls.append( source )
+			with open( source ) as src, open( target, 'w' ) as out:
+				out.write( src.read() + ' rendered' )
+
+		with tempfile.TemporaryDirectory() as tmp:
+			sources = self.make_sources( tmp, 6 )
+			# a duplicate frame
+			shutil.copyfile( sources[0], os.path.join( tmp, 'frame_06.dot' ))
+			sources.append( os.path.join( tmp, 'frame_06.dot' ))
+			directory = os.path.join( tmp, 'cache' )
+
+			cache = RenderCache( directory, version='1.0' )
+			pool = RenderPool( renderer, workers=1, format='txt', cache=cache )
+			results = pool.render( sources )
+			self.assertEqual( len(calls), 6 )
+			self.assertEqual( [ r.cached for r in results ], [ False ]*6 + [ True ] )
+			self.assertEqual( (cache.hits, cache.misses), (1, 6) )
+			with open( results[6].target ) as out:
+				self.assertEqual( out.read(), 'Digraph {\nv0;\n} rendered' )
+
+			# duplicate frames, rendered at the same time
+			sources.append( os.path.join( tmp, 'frame_07.dot' ))
+			shutil.copyfile( sources[1], sources[-1] )
+			results = RenderPool( renderer, workers=4, format='txt', cache=RenderCache( os.path.join( tmp, 'cache2' ))).render( sources[1:2] * 2 + sources[-1:] )
+			self.assertEqual( len(calls), 7 )
+			self.assertEqual( sorted( r.cached for r in results ), [ False, True, True ] )
+			sources.pop()
+
+			# next build, with another process: same cache directory
+			cache = RenderCache( directory, version='1.0' )
+			results = RenderPool( renderer, workers=3, format='txt', cache=cache ).render( sources )
+			self.assertEqual( len(calls), 7 )
+			self.assertTrue( all( r.cached for r in results ))
+			self.assertIn( '7 hits, 0 misses', cache.stats() )
+
+			# another renderer version
+			cache = RenderCache( directory, version='2.0' )
+			RenderPool( renderer, workers=1, format='txt', cache=cache ).render( sources[:2] )
+			self.assertEqual( len(calls), 9 )
+
+	def test_render_cache_eviction(self):
+		""" The least recently used entries are evicted first """
+		with tempfile.TemporaryDirectory() as tmp:
+			sources = self.make_sources( tmp, 4 )
+			size = os.path.getsize( sources[0] )
+			cache = RenderCache( os.path.join( tmp, 'cache' ), max_bytes=3*size )
+			pool = RenderPool( shutil.copyfile, workers=1, format='txt', cache=cache )
+			pool.render( sources[:3] )
+			# frame 0 is used again: frame 1 is the least recently used
+			pool.render( sources[:1] )
+			pool.render( sources[3:] )
+			self.assertEqual( cache.evictions, 1 )
+			keys = []
+			for source in sources:
+				with open( source, 'rb' ) as dot:
+					keys.append( cache.key( dot.read(), 'txt' ))
+			self.assertEqual( sorted( os.listdir( cache.directory )), sorted( keys[i] for i in (0, 2, 3) ))
+			self.assertEqual( list( cache.entries ), [ keys[2], keys[0], keys[3] ] )
+			self.assertLessEqual( cache.size, cache.max_bytes )
+
+			# a smaller limit: the directory is trimmed when the cache is opened, even if there is no miss afterwards
+			cache = RenderCache( cache.directory, max_bytes=size )
+			self.assertEqual( cache.evictions, 2 )
+			self.assertEqual( os.listdir( cache.directory ), [ keys[3] ] )
+			self.assertTrue( RenderPool( shutil.copyfile, workers=1, format='txt', cache=cache ).render( sources[3:] )[0].cached )
+
+	def test_render_cache_concurrent_eviction(self):
+		""" An entry removed by another process while it is copied is a miss """
+		with tempfile.TemporaryDirectory() as tmp:
+			sources = self.make_sources( tmp, 1 )
+			cache = RenderCache( os.path.join( tmp, 'cache' ))
+			pool = RenderPool( shutil.copyfile, workers=1, format='txt', cache=cache )
+			pool.render( sources )
+			key = next( iter( cache.entries ))
+
+			# the entry disappears after the copy, before its size is read
+			utime = os.utime
+			def utime_then_evict(path, *args):
+				utime( path, *args )
+				os.remove( path )
+			with mock.patch( 'render.os.utime', side_effect=utime_then_evict ):
+				self.assertFalse( cache.get( key, os.path.join( tmp, 'copy.txt' )))
+			self.assertEqual( (cache.hits, cache.misses), (0, 2) )
+			self.assertNotIn( key, cache.entries )
+
+	def test_command_renderer(self):
+		""" A stand-in for the dot command, with the same arguments """
+		script = 'import sys, shutil; shutil.copy( sys.argv[2], sys.argv[4] )'
+		with tempfile.TemporaryDirectory() as tmp:
+			sources = self.make_sources( tmp, 3 )
+			pool = RenderPool( command_renderer( (sys.executable, '-c', script), 'svg' ), workers=2, format='svg' )
+			for result in pool.render( sources ):
+				with open( result.source ) as src, open( result.target ) as out:
+					self.assertEqual( src.read(), out.read() )
+
+			pool = RenderPool( command_renderer( (sys.executable, '-c', 'import sys; sys.exit(1)') ), workers=2 )
+			with self.assertRaises( subprocess.CalledProcessError ):
+				pool.render( sources )
+
+
+def main():
+        unittest.main()
+
+if __name__ == '__main__':
+        main()
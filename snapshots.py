@@ -0,0 +1,272 @@
+#!/usr/bin/python3
+
+"""
+Snapshot sinks: where the step-by-step diagrams of a graph algorithm are written.
+
+A sink receives numbered frames (DOT strings), and stores them under the names `<prefix><number>.dot` (the number has at least two digits). Frames are buffered, and handed over to the backend by batches:
+
+* :class:`DirectorySink` writes one file per frame (the former behavior of the algorithms' `file_prefix` argument);
+* :class:`ArchiveSink` writes all frames as members of a single tar or zip file;
+* :class:`MemorySink` keeps the frames in a dictionary.
+
+Ex.::
+
+	with ArchiveSink('dijkstra.tar', 'dijkstra_') as sink:
+		g.dijkstra('s', sink)
+		g.dijkstra('s', sink.with_prefix('dijkstra_blank_'), blank=True)
+"""
+
+import unittest
+import io
+import os
+import tarfile
+import tempfile
+import time
+import zipfile
+
+
+class SnapshotSink():
+	""" Base class for the snapshot sinks: frames are buffered, and passed to :meth:`write_batch` when the buffer is full, or when the sink is flushed.
+
+	:param prefix: the prefix of the frame names
+	:type prefix: str
+	:param batch_size: the number of frames to be buffered before they are written
+	:type batch_size: int
+	"""
+
+	def __init__(self, prefix='', batch_size=64):
+		self.prefix = prefix
+		self.batch_size = batch_size
+		# buffered (name, DOT string) pairs
+		self.buffer = []
+		# views created by with_prefix(), flushed when this sink is closed
+		self.views = []
+
+	def name(self, number):
+		""" The name of a frame.
+
+		:param number: a frame number
+		:type number: int
+		:rtype: str
+		"""
+		return '{}{:02}.dot'.format( self.prefix, number )
+
+	def add(self, number, dot):
+		""" Add a frame to the sink.
+
+		:param number: the frame number
+		:type number: int
+		:param dot: the frame, in DOT format
+		:type dot: str
+		"""
+		self.buffer.append( (self.name( number ), dot) )
+		if len(self.buffer) >= self.batch_size:
+			self.flush()
+
+	def flush(self):
+		""" Write the buffered frames. """
+		if self.buffer:
+			self.write_batch( self.buffer )
+			self.buffer = []
+
+	def write_batch(self, frames):
+		""" Write a batch of frames: to be implemented by the backends.
+
+		:param frames: a list of (name, DOT string) pairs
+		:type frames: list
+		"""
+		raise NotImplementedError
+
+	def close(self):
+		""" Write the remaining frames, and release the backend. """
+		for view in self.views:
+			view.flush()
+		self.flush()
+
+	def with_prefix(self, prefix):
+		""" Return a view of this sink that names the frames with another prefix (ex. to store the key and the blank template of an exercise in the same archive).
+
+		:param prefix: the prefix of the frame names
+		:type prefix: str
+		:rtype: SnapshotSink
+		"""
+		view = PrefixedSink( self, prefix )
+		self.views.append( view )
+		return view
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+
+class PrefixedSink( SnapshotSink ):
+	""" A view of another sink, with its own prefix: frames are passed on to the other sink when flushed. Closing the view only flushes it; closing the other sink flushes the view.
+
+	:param sink: the actual sink
+	:type sink: SnapshotSink
+	:param prefix: the prefix of the frame names
+	:type prefix: str
+	"""
+
+	def __init__(self, sink, prefix):
+		super().__init__( prefix, sink.batch_size )
+		self.sink = sink
+
+	def write_batch(self, frames):
+		self.sink.write_batch( frames )
+
+
+class MemorySink( SnapshotSink ):
+	""" Keep the frames in memory: `frames` maps frame names to DOT strings, in the order they were added.
+
+	:param prefix: the prefix of the frame names
+	:type prefix: str
+	"""
+
+	def __init__(self, prefix=''):
+		super().__init__( prefix )
+		self.frames = {}
+
+	def write_batch(self, frames):
+		self.frames.update( frames )
+
+
+class DirectorySink( SnapshotSink ):
+	""" Write each frame to a file `<prefix><number>.dot`: the prefix may include a directory path.
+
+	:param prefix: the prefix of the file names
+	:type prefix: str
+	:param batch_size: the number of frames to be buffered before they are written
+	:type batch_size: int
+	"""
+
+	def write_batch(self, frames):
+		for name, dot in frames:
+			with open( name, 'w' ) as out:
+				out.write( dot )
+
+
+class ArchiveSink( SnapshotSink ):
+	""" Write the frames as the members of a single archive file: a zip file if its name ends with `.zip`, a tar file otherwise (compressed if its name ends with `.tar.gz`, `.tgz`, `.tar.bz2` or `.tar.xz`).
+
+	The archive is created when the sink is created, and complete once it is closed.
+
+	:param path: the archive file
+	:type path: str
+	:param prefix: the prefix of the member names
+	:type prefix: str
+	:param batch_size: the number of frames to be buffered before they are written
+	:type batch_size: int
+	"""
+
+	def __init__(self, path, prefix='', batch_size=64):
+		super().__init__( prefix, batch_size )
+		self.path = path
+		if path.endswith('.zip'):
+			self.archive = zipfile.ZipFile( path, 'w', zipfile.ZIP_DEFLATED )
+		else:
+			mode = 'w'
+			for extension, compression in (('.tar.gz', 'gz'), ('.tgz', 'gz'), ('.tar.bz2', 'bz2'), ('.tar.xz', 'xz')):
+				if path.endswith( extension ):
+					mode = 'w:' + compression
+			self.archive = tarfile.open( path, mode )
+
+	def write_batch(self, frames):
+		if isinstance( self.archive, zipfile.ZipFile ):
+			for name, dot in frames:
+				self.archive.writestr( name, dot )
+			return
+		now = time.time()
+		for name, dot in frames:
+			data = dot.encode('utf-8')
+			info = tarfile.TarInfo( name )
+			info.size = len(data)
+			info.mtime = now
+			self.archive.addfile( info, io.BytesIO( data ))
+
+	def close(self):
+		if self.archive is not None:
+			super().close()
+			self.archive.close()
+			self.archive = None
+
+
+def make_sink(target):
+	""" Return a sink for an algorithm's snapshots.
+
+	:param target: a sink, or a file prefix (for a :class:`DirectorySink`); None or an empty string mean no snapshot.
+	:type target: SnapshotSink or str
+	:return: a pair (sink, owned): `owned` is True if the sink has been created here, and is to be closed by the caller; the sink is None if no snapshot is required.
+	:rtype: tuple
+	"""
+	if target is None or target == '':
+		return (None, False)
+	if isinstance( target, str ):
+		return (DirectorySink( target ), True)
+	return (target, False)
+
+
+class SnapshotSinkUnitTest( unittest.TestCase ):
+
+	frames = [ (i, 'Digraph {{\nv{};\n}}'.format(i)) for i in range(5) ]
+
+	def fill(self, sink):
+		for number, dot in self.frames:
+			sink.add( number, dot )
+
+	def expected(self, prefix):
+		return { '{}{:02}.dot'.format(prefix, number): dot for number, dot in self.frames }
+
+	def test_memory_sink(self):
+		sink = MemorySink('bfs_')
+		self.fill( sink )
+		sink.flush()
+		self.assertEqual( sink.frames, self.expected('bfs_') )
+		self.assertEqual( list(sink.frames), sorted(sink.frames) )
+
+	def test_directory_sink_batches(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			sink = DirectorySink( os.path.join( tmp, 'bfs_' ), batch_size=2 )
+			self.fill( sink )
+			# the last frame is still buffered
+			self.assertEqual( len(os.listdir( tmp )), 4 )
+			sink.close()
+			names = sorted( os.listdir( tmp ))
+			self.assertEqual( names, sorted( self.expected('bfs_') ))
+			for name in names:
+				with open( os.path.join( tmp, name )) as f:
+					self.assertEqual( f.read(), self.expected('bfs_')[name] )
+
+	def test_archive_sink(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			for name in ('frames.tar', 'frames.tar.gz', 'frames.zip'):
+				path = os.path.join( tmp, name )
+				with ArchiveSink( path, 'key_', batch_size=3 ) as sink:
+					self.fill( sink )
+					self.fill( sink.with_prefix('blank_') )
+				expected = self.expected('key_')
+				expected.update( self.expected('blank_') )
+				if name.endswith('.zip'):
+					with zipfile.ZipFile( path ) as archive:
+						members = { member: archive.read( member ).decode('utf-8') for member in archive.namelist() }
+				else:
+					with tarfile.open( path ) as archive:
+						members = { member.name: archive.extractfile( member ).read().decode('utf-8') for member in archive.getmembers() }
+				self.assertEqual( members, expected )
+
+	def test_make_sink(self):
+		self.assertEqual( make_sink(''), (None, False) )
+		self.assertEqual( make_sink(None), (None, False) )
+		sink, owned = make_sink('bfs_')
+		self.assertTrue( isinstance( sink, DirectorySink ) and owned )
+		memory = MemorySink()
+		self.assertEqual( make_sink( memory ), (memory, False) )
+
+
+def main():
+        unittest.main()
+
+if __name__ == '__main__':
+        main()